@@ -0,0 +1,71 @@
+"""Event loop lag while uploaded images are resized inline versus through process_image.
+
+Each image is rendered in every size and format the upload handlers store.
+
+A ticker sleeps 5 ms in a loop and records how late each wake-up is while N resizes run:
+
+    python -m benchmarks.bench_image_event_loop_lag --images 16 --side 2400
+"""
+import argparse
+import asyncio
+import io
+import statistics
+import time
+from PIL import Image
+from src.config import settings
+from src.image_handler import process_image, render_variants, shutdown_executor
+
+TICK = 0.005
+
+
+def make_image(side: int) -> bytes:
+    output = io.BytesIO()
+    Image.effect_noise((side, side), 64).convert("RGB").save(output, format="PNG")
+    return output.getvalue()
+
+
+async def ticker(lags, stop):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - started - TICK)
+
+
+async def inline(content):
+    return render_variants(content, settings.image_quality)
+
+
+async def measure(name, resize, content, images):
+    lags, stop = [], asyncio.Event()
+    tick_task = asyncio.create_task(ticker(lags, stop))
+    await asyncio.sleep(TICK * 2)
+    started = time.perf_counter()
+    await asyncio.gather(*(resize(content) for _ in range(images)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await tick_task
+    lags.sort()
+    p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))]
+    print(f"{name:>8}: total {elapsed * 1000:8.1f} ms  lag max {lags[-1] * 1000:7.1f} ms  "
+          f"p99 {p99 * 1000:7.1f} ms  median {statistics.median(lags) * 1000:5.1f} ms  ({len(lags)} ticks)")
+
+
+async def bench(images, side):
+    content = make_image(side)
+    # Start the pool workers before timing so their spawn cost is not counted
+    await process_image(content)
+    await measure("inline", inline, content, images)
+    await measure("executor", process_image, content, images)
+    shutdown_executor()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=8)
+    parser.add_argument("--side", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(bench(args.images, args.side))
+
+
+if __name__ == "__main__":
+    main()
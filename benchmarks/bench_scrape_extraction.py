@@ -0,0 +1,42 @@
+"""Per-product latency of the two scrape_product_data extraction modes.
+
+Needs a real Firefox/geckodriver and SellerAMP credentials (SA_SAS_EMAIL/SA_SAS_PASS):
+
+    python -m benchmarks.bench_scrape_extraction 5012345678900:4.50 5098765432109:2.10 --rounds 5
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from src.driver.services import load_logged_in_driver, quit_driver, search_ean_on_selleramp, scrape_product_data
+
+
+async def bench(items, rounds):
+    browser = await asyncio.to_thread(load_logged_in_driver)
+    timings = {"elements": [], "script": []}
+    try:
+        for ean, cost in items:
+            await search_ean_on_selleramp(browser, ean)
+            for _ in range(rounds):
+                for mode in timings:
+                    started = time.perf_counter()
+                    await scrape_product_data(browser, cost, mode=mode)
+                    timings[mode].append(time.perf_counter() - started)
+    finally:
+        await asyncio.to_thread(quit_driver, browser)
+    for mode, samples in timings.items():
+        print(f"{mode:>8}: mean {statistics.mean(samples) * 1000:7.1f} ms  "
+              f"median {statistics.median(samples) * 1000:7.1f} ms  ({len(samples)} scrapes)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("items", nargs="+", help="EAN:cost pairs to look up")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    items = [(item.split(":")[0], float(item.split(":")[1])) for item in args.items]
+    asyncio.run(bench(items, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,17 @@
-import os
-import shutil
-from fastapi import APIRouter, HTTPException, UploadFile, File, Depends
-import secrets
-from PIL import Image
+from typing import Optional
+from fastapi import APIRouter, HTTPException, UploadFile, File, Depends, Query, BackgroundTasks
 from tortoise.exceptions import DoesNotExist
 from src.business.schemas import user_business_pydantic, user_business_pydanticIn, user_product_pydantic,\
     user_product_pydanticIn, UserProduct, UserBusiness
-from src.user.schemas import User
 from datetime import datetime
 from src.user.services import get_current_user
 from src.exceptions import ServerErrorException, UserNotFoundException, ProductNotFoundException, UnauthorizedUserException,\
     InvalidIdException
 from src.business.exceptions import BusinessNotFoundException
+from src.business.services import delete_business_tree
+from src.image_handler import ALLOWED_EXTENSIONS, file_extension, store_image
+from src.storage import storage
+from src.pagination import paginate, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 
 
 router = APIRouter(
@@ -24,13 +24,10 @@ router = APIRouter(
 async def add_user_business(business_info: user_business_pydanticIn,
                             current_user=Depends(get_current_user)):
     try:
-        user = await User.get_or_none(id=current_user.id)
-        if user is None:
-            raise UserNotFoundException("User not found")
         business_details = business_info.dict(exclude_unset=True)
         business_details["creation_date"] = datetime.utcnow()
         business_details["last_updated"] = datetime.utcnow()
-        business_details["owner_id"] = user.id
+        business_details["owner_id"] = current_user.id
         business_obj = await UserBusiness.create(**business_details)
         response = await user_business_pydantic.from_tortoise_orm(business_obj)
         return {"status": "ok", "data": response}
@@ -93,30 +90,24 @@ async def update_user_business(business_id: int, update_info: user_business_pyda
 
 
 @router.delete('/delete/{business_id}')
-async def delete_user_business(business_id: int, current_user=Depends(get_current_user)):
+async def delete_user_business(business_id: int, background_tasks: BackgroundTasks,
+                               current_user=Depends(get_current_user)):
     if business_id == 0:
         raise InvalidIdException("Invalid business id")
-    business = await UserBusiness.get(id=business_id)
-    owner = await User.filter(id=business.owner_id).first()
-    if current_user.username not in ["root", "master"] or current_user.id != owner.id:
-        raise HTTPException(status_code=403, detail="User not authorized")
     try:
-        try:
-            products = await UserProduct.filter(business=business).all()
-            if products:
-                for product in products:
-                    await delete_user_product(product.id)
-            try:
-                await business.delete()
-            except Exception as e:
-                ServerErrorException(f"{e}: Internal Server Error while deleting User Business")
-        except Exception as e:
-            ServerErrorException(f"{e}: Internal Server Error while deleting User Business Products")
+        business = await UserBusiness.get(id=business_id)
+        if current_user.username not in ["root", "master"] and current_user.id != business.owner_id:
+            raise HTTPException(status_code=403, detail="User not authorized")
+        prefixes = await delete_business_tree(business)
+        # Image folders can be large, remove them after the response has gone out
+        background_tasks.add_task(storage.delete_prefixes, prefixes)
         return {"status": "ok", "response": "Successfully deleted User Business and associated products"}
     except DoesNotExist as dne:
-        BusinessNotFoundException(str(dne))
+        raise BusinessNotFoundException(str(dne))
+    except HTTPException as e:
+        raise e
     except Exception as e:
-        ServerErrorException(str(e))
+        raise ServerErrorException(f"{e}: Internal Server Error while deleting User Business")
 
 
 
@@ -137,17 +128,30 @@ async def add_user_product(business_id: int, product_details: user_product_pydan
         raise ServerErrorException(str(e))
 
 @router.get('/{business_id}/get/products')
-async def get_all_business_products(business_id: int, current_user=Depends(get_current_user)):
+async def get_all_business_products(business_id: int, cursor: Optional[str] = None,
+                                    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                                    sort: str = Query("id", regex="^-?(id|last_updated|price|cost)$"),
+                                    category: Optional[str] = None, min_price: Optional[float] = None,
+                                    max_price: Optional[float] = None, current_user=Depends(get_current_user)):
     if business_id == 0:
         raise InvalidIdException("Invalid product id")
     try:
         business = await UserBusiness.get(id=business_id)
         if current_user.id != business.owner_id:
             raise UnauthorizedUserException("User not authorized")
-        response = await user_product_pydantic.from_queryset(UserProduct.filter(business=business))
-        return {"status": "ok", "data": response}
+        products = UserProduct.filter(business_id=business.id)
+        if category is not None:
+            products = products.filter(category=category)
+        if min_price is not None:
+            products = products.filter(price__gte=min_price)
+        if max_price is not None:
+            products = products.filter(price__lte=max_price)
+        response, next_cursor = await paginate(products, user_product_pydantic, sort, cursor, limit)
+        return {"status": "ok", "data": response, "next_cursor": next_cursor}
     except DoesNotExist as dne:
         raise BusinessNotFoundException(str(dne))
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise ServerErrorException(str(e))
 
@@ -198,13 +202,7 @@ async def delete_user_product(product_id: int, current_user=Depends(get_current_
         if current_user.id != business.owner_id:
             raise UnauthorizedUserException("User not authorized")
         await UserProduct.filter(id=product_id).delete()
-
-        # Get the base path of your project
-        base_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        static_folder = os.path.join(base_folder, 'static')
-        folder_path = os.path.join(static_folder, f"user_products/{product_id}")
-        if os.path.exists(folder_path):
-            shutil.rmtree(folder_path)
+        await storage.delete_prefix(f"user_products/{product_id}")
         return {"status": "ok", "message": "product successfully deleted"}
     except DoesNotExist as dne:
         raise ProductNotFoundException(str(dne))
@@ -222,30 +220,15 @@ async def create_upload_file(product_id: int, file: UploadFile = File(...), curr
         business = await product.business
         if current_user.id != business.owner_id:
             raise UnauthorizedUserException("User not authorized")
-
-        # Get the base path of your project
-        base_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        static_folder = os.path.join(base_folder, 'static')
-        filepath = os.path.join(static_folder, f'user_products/{product_id}/')
-        if not os.path.exists(filepath):
-            os.makedirs(filepath)
-        filename = file.filename
-        extension = filename.split(".")[1]
-        if extension not in ["jpg", "png", "jpeg"]:
+        extension = file_extension(file.filename)
+        if extension not in ALLOWED_EXTENSIONS:
             return {"status": "error", "detail": "file extension not allowed"}
-        token_name = secrets.token_hex(10) + "." + extension
-        generated_name = os.path.join(filepath, token_name)
-        file_content = await file.read()
-        with open(generated_name, "wb") as f:
-            f.write(file_content)
-            img = Image.open(generated_name)
-            img = img.resize(size=(200, 200))
-            img.save(generated_name)
-            f.close()
-        product.product_image = token_name
+        digest, urls = await store_image(file)
+        product.product_image = digest
         await product.save()
-        file_url = "localhost:8000" + generated_name[1:]
-        return {"status": "ok", "filename": file_url}
+        return {"status": "ok", "filename": urls["thumbnail"]["jpeg"], "images": urls}
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise ServerErrorException(str(e))
 
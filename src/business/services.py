@@ -0,0 +1,12 @@
+from typing import List
+from tortoise.transactions import in_transaction
+from src.business.schemas import UserBusiness, UserProduct
+
+
+async def delete_business_tree(business: UserBusiness) -> List[str]:
+    product_ids = await UserProduct.filter(business_id=business.id).values_list("id", flat=True)
+    async with in_transaction() as connection:
+        await UserProduct.filter(business_id=business.id).using_db(connection).delete()
+        await UserBusiness.filter(id=business.id).using_db(connection).delete()
+    # Storage prefixes of images uploaded per product before they were stored by content hash
+    return [f"user_products/{product_id}" for product_id in product_ids]
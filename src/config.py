@@ -1,3 +1,4 @@
+from typing import Optional
 from bson import ObjectId
 from pydantic import AnyUrl, BaseSettings, EmailStr, validator
 
@@ -42,6 +43,35 @@ class AppSettings(BaseSettings):
     google_server_token_url: str
     google_server_userinfo_url: str
 
+    # "process" or "thread", the pool that decodes, resizes and encodes uploaded images
+    image_executor: str = "process"
+    image_workers: int = 2
+    image_max_concurrency: int = 4
+    image_max_bytes: int = 10 * 1024 * 1024
+    image_quality: int = 80
+
+    # Seconds a verified token and a loaded user are reused before going back to the JWT / database
+    auth_token_cache_ttl: int = 300
+    auth_user_cache_ttl: int = 30
+    auth_cache_size: int = 10000
+
+    # "local" writes under static/ next to the source, "s3" to any S3-compatible bucket (AWS, MinIO, ...)
+    storage_backend: str = "local"
+    storage_local_root: Optional[str] = None
+    # Prefix of the URLs handed back for stored files, the /static mount for local storage or a bucket/CDN URL
+    storage_base_url: str = "localhost:8000/static"
+    storage_s3_bucket: Optional[str] = None
+    storage_s3_prefix: str = ""
+    storage_s3_endpoint_url: Optional[str] = None
+    storage_s3_region: Optional[str] = None
+    storage_s3_access_key_id: Optional[str] = None
+    storage_s3_secret_access_key: Optional[str] = None
+    storage_s3_part_size: int = 8 * 1024 * 1024
+
+    # Byte budget of the in-memory cache for small static files, and the largest file it holds
+    static_cache_bytes: int = 64 * 1024 * 1024
+    static_cache_max_file_bytes: int = 512 * 1024
+
     @property
     def db_uri(self) -> str:
         return self.postgresql_url
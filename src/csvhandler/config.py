@@ -0,0 +1,20 @@
+from pydantic import BaseSettings
+import os
+
+
+class CsvSettings(BaseSettings):
+
+    class Config:
+        env_file = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".env"))
+        env_file_encoding = "utf-8"
+        env_prefix = "csv_"
+
+    chunk_size: int = 64 * 1024
+    # Longest single line accepted, bounds the memory held while looking for the next newline
+    max_line_length: int = 1024 * 1024
+    import_batch_size: int = 1000
+    # Import reports list at most this many rejected rows, the rest are only counted
+    import_max_errors: int = 1000
+
+
+csv_settings = CsvSettings()
@@ -7,3 +7,9 @@ class CsvFileException(HTTPException):
         super().__init__(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                          detail="Error while processing the CSV file")
         logging.exception(f"CsvFileException: {error_message}")
+
+
+class CsvMappingException(HTTPException):
+    def __init__(self, error_message: str):
+        super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid CSV column mapping: {error_message}")
+        logging.exception(f"CsvMappingException: {error_message}")
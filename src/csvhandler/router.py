@@ -1,8 +1,14 @@
-import csv
-import io
-from fastapi import UploadFile, File, APIRouter
-from src.csvhandler.exceptions import CsvFileException
-from src.exceptions import ServerErrorException
+import asyncio
+import json
+from typing import Optional
+from fastapi import UploadFile, File, Form, APIRouter, Depends
+from tortoise.exceptions import DoesNotExist
+from src.csvhandler.exceptions import CsvFileException, CsvMappingException
+from src.csvhandler.services import CsvStream, ProductCsvImport, import_wholesale_products
+from src.exceptions import ServerErrorException, InvalidIdException
+from src.user.services import get_current_user
+from src.wholesale.exceptions import WholesaleNotFoundException
+from src.wholesale.schemas import WholesaleBusiness
 
 
 router = APIRouter(
@@ -14,17 +20,35 @@ router = APIRouter(
 @router.post('/')
 async def csv_wholesale_products(file: UploadFile = File(...)):
     try:
-        csv_file = file.file
-        csv_reader = csv.DictReader(io.StringIO(csv_file.read().decode('utf-8')))
-        products = []
-        try:
-            for row in csv_reader:
-                try:
-                    products.append(row)
-                except Exception as e:
-                    raise ServerErrorException(str(e))
-        except Exception as e:
-            raise CsvFileException(str(e))
-        return {"status": "ok", "data": products}
+        stream = CsvStream(file.file)
+        # Parsing is blocking file IO and CPU work, keep it off the event loop
+        await asyncio.to_thread(stream.consume)
+        return {"status": "ok", "data": stream.summary()}
+    except CsvFileException as e:
+        raise e
     except Exception as e:
-        ServerErrorException(str(e))
+        raise ServerErrorException(str(e))
+
+
+@router.post('/import/{wholesale_id}')
+async def import_wholesale_products_csv(wholesale_id: int, file: UploadFile = File(...),
+                                        mapping: Optional[str] = Form(None), current_user=Depends(get_current_user)):
+    if wholesale_id == 0:
+        raise InvalidIdException("Invalid wholesale id")
+    try:
+        wholesale = await WholesaleBusiness.get(id=wholesale_id, owner_id=current_user.id)
+        # Optional JSON object of {"csv column": "product field"} for sheets with their own headers
+        column_mapping = json.loads(mapping) if mapping else None
+        if column_mapping is not None and not isinstance(column_mapping, dict):
+            raise CsvMappingException("mapping must be a JSON object")
+        products = ProductCsvImport(CsvStream(file.file), column_mapping)
+        summary = await import_wholesale_products(products, wholesale)
+        return {"status": "ok", "data": summary}
+    except DoesNotExist as dne:
+        raise WholesaleNotFoundException(str(dne))
+    except json.JSONDecodeError as e:
+        raise CsvMappingException(str(e))
+    except (CsvFileException, CsvMappingException) as e:
+        raise e
+    except Exception as e:
+        raise ServerErrorException(str(e))
@@ -0,0 +1,147 @@
+import asyncio
+import codecs
+import csv
+import itertools
+from collections import deque
+from datetime import datetime
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+from tortoise.transactions import in_transaction
+from src.csvhandler.config import csv_settings
+from src.csvhandler.exceptions import CsvFileException, CsvMappingException
+from src.wholesale.schemas import WholesaleBusiness, WholesaleProduct
+
+
+class CsvStream:
+    """Parses an uploaded CSV file chunk by chunk, holding at most one chunk and one line in memory."""
+
+    def __init__(self, fileobj: BinaryIO, chunk_size: int = csv_settings.chunk_size,
+                 max_line_length: int = csv_settings.max_line_length):
+        self.fileobj = fileobj
+        self.chunk_size = chunk_size
+        self.max_line_length = max_line_length
+        self.byte_count = 0
+        self.row_count = 0
+        self.columns: List[str] = []
+
+    def _text_chunks(self) -> Iterator[str]:
+        # utf-8-sig also strips the byte order mark spreadsheet exports tend to start with
+        decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        while True:
+            chunk = self.fileobj.read(self.chunk_size)
+            if not chunk:
+                break
+            self.byte_count += len(chunk)
+            yield decoder.decode(chunk)
+        yield decoder.decode(b"", final=True)
+
+    def _lines(self) -> Iterator[str]:
+        pending = ""
+        for text in self._text_chunks():
+            pending += text
+            *lines, pending = pending.split("\n")
+            for line in lines:
+                yield line + "\n"
+            if len(pending) > self.max_line_length:
+                raise CsvFileException(f"Line longer than {self.max_line_length} characters")
+        if pending:
+            yield pending
+
+    def rows(self) -> Iterator[dict]:
+        try:
+            reader = csv.DictReader(self._lines())
+            if not reader.fieldnames:
+                raise CsvFileException("CSV file has no header row")
+            self.columns = list(reader.fieldnames)
+            for row in reader:
+                self.row_count += 1
+                yield row
+        except (csv.Error, UnicodeDecodeError) as e:
+            raise CsvFileException(str(e))
+
+    def consume(self):
+        deque(self.rows(), maxlen=0)
+
+    def summary(self) -> dict:
+        return {"rows": self.row_count, "bytes": self.byte_count, "columns": self.columns}
+
+
+# WholesaleProduct columns a CSV row can fill, with the longest value each accepts
+PRODUCT_FIELDS = {"name": 100, "category": 100, "price": None, "description": None, "ean": 30}
+
+
+def validate_product_row(row: dict) -> Tuple[dict, List[str]]:
+    values, errors = {}, []
+    for field, max_length in PRODUCT_FIELDS.items():
+        value = (row.get(field) or "").strip()
+        if not value:
+            errors.append(f"{field} is required")
+        elif max_length is not None and len(value) > max_length:
+            errors.append(f"{field} is longer than {max_length} characters")
+        values[field] = value
+    if values["price"]:
+        try:
+            values["price"] = float(values["price"].lstrip("£"))
+            if values["price"] <= 0:
+                errors.append("price must be greater than 0")
+        except ValueError:
+            errors.append("price is not a number")
+    return values, errors
+
+
+class ProductCsvImport:
+    """Turns a CsvStream into batches of validated WholesaleProduct values, recording rejected rows."""
+
+    def __init__(self, stream: CsvStream, mapping: Optional[Dict[str, str]] = None,
+                 batch_size: int = csv_settings.import_batch_size, max_errors: int = csv_settings.import_max_errors):
+        self.stream = stream
+        self.mapping = mapping or {}
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.imported = 0
+        self.rejected = 0
+        self.errors: List[dict] = []
+        unknown = set(self.mapping.values()) - set(PRODUCT_FIELDS)
+        if unknown:
+            raise CsvMappingException(f"unknown product fields {sorted(unknown)}")
+
+    def _check_columns(self):
+        mapped = {self.mapping.get(column, column) for column in self.stream.columns}
+        missing = set(PRODUCT_FIELDS) - mapped
+        if missing:
+            raise CsvMappingException(f"no column for {sorted(missing)}")
+
+    def _valid_rows(self) -> Iterator[dict]:
+        rows = self.stream.rows()
+        first = next(rows, None)
+        self._check_columns()
+        # Line 1 is the header
+        for line, row in enumerate(itertools.chain([first] if first else [], rows), start=2):
+            values, errors = validate_product_row({self.mapping.get(column, column): value
+                                                   for column, value in row.items()})
+            if errors:
+                self.rejected += 1
+                if len(self.errors) < self.max_errors:
+                    self.errors.append({"line": line, "errors": errors})
+                continue
+            yield values
+
+    def batches(self) -> Iterator[List[dict]]:
+        rows = self._valid_rows()
+        while batch := list(itertools.islice(rows, self.batch_size)):
+            yield batch
+
+    def summary(self) -> dict:
+        return {**self.stream.summary(), "imported": self.imported, "rejected": self.rejected, "errors": self.errors}
+
+
+async def import_wholesale_products(products: ProductCsvImport, wholesale: WholesaleBusiness) -> dict:
+    batches = products.batches()
+    now = datetime.utcnow()
+    async with in_transaction() as connection:
+        # Parse the next batch in a thread while the event loop stays free, then insert it in one statement
+        while (batch := await asyncio.to_thread(next, batches, None)) is not None:
+            await WholesaleProduct.bulk_create([WholesaleProduct(**values, business=wholesale, creation_date=now,
+                                                                 last_updated=now) for values in batch],
+                                               using_db=connection)
+            products.imported += len(batch)
+    return products.summary()
@@ -0,0 +1,109 @@
+import logging
+import re
+from datetime import datetime, timedelta
+from typing import Optional
+from cachetools import TTLCache
+from src.models import ScrapedProduct
+from src.wholesale.schemas import WholesaleScrapedProduct
+
+
+def _to_float(text) -> float:
+    return float(re.sub(r"[^0-9.\-]", "", str(text)))
+
+
+def _to_int(text) -> int:
+    return int(re.sub(r"[^0-9]", "", str(text)) or 0)
+
+
+def scraped_row_to_data(row: ScrapedProduct) -> dict:
+    # Rows only keep the numeric summary, fields the tables do not store come back empty
+    return {
+        'asin': row.asin,
+        'ean': row.ean,
+        'price': row.price,
+        'product': getattr(row, 'name', None),
+        'reviews': row.rating,
+        'reviewCount': row.reviews,
+        'alerts': None,
+        'est': None,
+        'bsr': None,
+        'profit': row.profit,
+        'roi': row.ROI,
+        'fbaSellers': row.FBA,
+        'fbmSellers': row.FBM,
+        'amazon': row.AMZ,
+    }
+
+
+class ScrapeCache:
+    """Scrape results keyed on (ean, cost), looked up in memory, then in the scraped product tables."""
+
+    def __init__(self, ttl: int, maxsize: int):
+        self.ttl = ttl
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.memory_hits = 0
+        self.database_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(ean: str, cost: float):
+        return ean, round(cost, 2)
+
+    async def _from_database(self, ean: str, cost: float) -> Optional[dict]:
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl)
+        for model in (ScrapedProduct, WholesaleScrapedProduct):
+            row = await model.filter(ean=ean, cost=round(cost, 2), last_updated__gte=cutoff)\
+                .order_by("-last_updated").first()
+            if row is not None:
+                return scraped_row_to_data(row)
+        return None
+
+    async def get(self, ean: str, cost: float) -> Optional[dict]:
+        key = self._key(ean, cost)
+        data = self._memory.get(key)
+        if data is not None:
+            self.memory_hits += 1
+            return data
+        data = await self._from_database(ean, cost)
+        if data is not None:
+            self.database_hits += 1
+            self._memory[key] = data
+            return data
+        self.misses += 1
+        return None
+
+    async def set(self, ean: str, cost: float, data: dict):
+        self._memory[self._key(ean, cost)] = data
+        try:
+            await ScrapedProduct.create(
+                asin=data['asin'],
+                ean=ean,
+                cost=round(cost, 2),
+                rating=data['reviews'],
+                reviews=_to_int(data['reviewCount']),
+                ROI=_to_float(data['roi']),
+                price=_to_float(data['price']),
+                profit=data['profit'],
+                FBA=str(data['fbaSellers'])[:50],
+                FBM=str(data['fbmSellers'])[:50],
+                AMZ=str(data['amazon'])[:50],
+                creation_date=datetime.utcnow(),
+                last_updated=datetime.utcnow(),
+            )
+        except Exception as e:
+            # The in-memory entry still serves repeats, only persistence across restarts is lost
+            logging.warning(f"Could not persist scrape of EAN {ean}: {e}")
+
+    def clear(self):
+        self._memory.clear()
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.database_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "database_hits": self.database_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.memory_hits + self.database_hits) / lookups if lookups else 0.0,
+            "entries": len(self._memory),
+            "ttl": self.ttl,
+        }
@@ -11,6 +11,18 @@ class SASettings(BaseSettings):
 
     sas_email: EmailStr
     sas_pass: str
+    pool_size: int = 2
+    lease_timeout: float = 60.0
+    batch_limit: int = 1000
+    # "script" reads the whole page in one execute_script call, "elements" uses one lookup per field
+    scrape_mode: str = "script"
+    cache_ttl: int = 86400
+    cache_size: int = 10000
+    job_workers: int = 2
+    job_max_attempts: int = 3
+    job_retry_delay: float = 30.0
+    # Jobs left "running" for longer than this were orphaned by a restart and are queued again
+    job_stale_after: int = 900
 
 
 sa_settings = SASettings()
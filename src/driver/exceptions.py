@@ -0,0 +1,27 @@
+import logging
+from fastapi import HTTPException, status
+
+
+class BrowserPoolTimeoutException(HTTPException):
+    def __init__(self, error_message: str):
+        super().__init__(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                         detail="All browsers are busy, try again shortly")
+        logging.exception(f"BrowserPoolTimeoutException: {error_message}")
+
+
+class BrowserLaunchException(HTTPException):
+    def __init__(self, error_message: str):
+        super().__init__(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Could not start a browser")
+        logging.exception(f"BrowserLaunchException: {error_message}")
+
+
+class JobNotFoundException(HTTPException):
+    def __init__(self, error_message: str):
+        super().__init__(status_code=status.HTTP_404_NOT_FOUND, detail="Scrape job with this id not found")
+        logging.exception(f"JobNotFoundException: {error_message}")
+
+
+class JobNotRetryableException(HTTPException):
+    def __init__(self, error_message: str):
+        super().__init__(status_code=status.HTTP_409_CONFLICT, detail="Only failed scrape jobs can be retried")
+        logging.exception(f"JobNotRetryableException: {error_message}")
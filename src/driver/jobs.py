@@ -0,0 +1,160 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, List, Optional, Set
+from uuid import UUID
+from fastapi import HTTPException
+from src.driver.config import sa_settings
+from src.driver.exceptions import JobNotFoundException, JobNotRetryableException
+from src.driver.schemas import ScrapeItem, ScrapeJob
+from src.driver.services import browser_pool, scrape_cache, search_ean_on_selleramp, scrape_product_data
+
+
+def job_snapshot(job: ScrapeJob) -> dict:
+    return {
+        "id": str(job.id),
+        "ean": job.ean,
+        "cost": job.cost,
+        "status": job.status,
+        "progress": job.progress,
+        "attempts": job.attempts,
+        "result": job.result,
+        "error": job.error,
+        "creation_date": job.creation_date.isoformat(),
+        "last_updated": job.last_updated.isoformat(),
+    }
+
+
+class ScrapeJobQueue:
+    """Runs persisted ScrapeJob rows on a fixed number of background workers."""
+
+    def __init__(self, workers: int, max_attempts: int, retry_delay: float, stale_after: int):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.stale_after = stale_after
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._subscribers: Dict[UUID, Set[asyncio.Queue]] = {}
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue()
+        await self._recover()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    async def _recover(self):
+        # Jobs persisted before a restart are picked up again
+        stale = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        await ScrapeJob.filter(status=ScrapeJob.RUNNING, last_updated__lt=stale)\
+            .update(status=ScrapeJob.QUEUED, progress=0)
+        for job_id in await ScrapeJob.filter(status=ScrapeJob.QUEUED).order_by("creation_date")\
+                .values_list("id", flat=True):
+            self._queue.put_nowait(job_id)
+
+    async def submit(self, item: ScrapeItem, force_refresh: bool = False) -> ScrapeJob:
+        if self._queue is None:
+            await self.start()
+        job = await ScrapeJob.create(ean=item.ean, cost=item.cost, force_refresh=force_refresh)
+        self._queue.put_nowait(job.id)
+        return job
+
+    async def get(self, job_id: UUID) -> ScrapeJob:
+        job = await ScrapeJob.get_or_none(id=job_id)
+        if job is None:
+            raise JobNotFoundException(f"No scrape job {job_id}")
+        return job
+
+    async def retry(self, job_id: UUID) -> ScrapeJob:
+        if self._queue is None:
+            await self.start()
+        job = await self.get(job_id)
+        if job.status != ScrapeJob.FAILED:
+            raise JobNotRetryableException(f"Scrape job {job_id} is {job.status}")
+        await self._update(job, status=ScrapeJob.QUEUED, progress=0, attempts=0, error=None)
+        self._queue.put_nowait(job.id)
+        return job
+
+    async def subscribe(self, job_id: UUID) -> AsyncIterator[dict]:
+        job = await self.get(job_id)
+        updates: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job.id, set()).add(updates)
+        try:
+            snapshot = job_snapshot(job)
+            yield snapshot
+            while not job.finished:
+                snapshot = await updates.get()
+                yield snapshot
+                if snapshot["status"] in (ScrapeJob.DONE, ScrapeJob.FAILED):
+                    break
+        finally:
+            self._subscribers[job.id].discard(updates)
+            if not self._subscribers[job.id]:
+                del self._subscribers[job.id]
+
+    async def _update(self, job: ScrapeJob, **changes):
+        changes["last_updated"] = datetime.utcnow()
+        for name, value in changes.items():
+            setattr(job, name, value)
+        await job.save(update_fields=list(changes))
+        for updates in self._subscribers.get(job.id, ()):
+            updates.put_nowait(job_snapshot(job))
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                logging.exception(f"Scrape job {job_id} crashed: {e}")
+
+    async def _claim(self, job_id: UUID) -> Optional[ScrapeJob]:
+        # Guarded update so a job enqueued by several app workers only runs once
+        claimed = await ScrapeJob.filter(id=job_id, status=ScrapeJob.QUEUED)\
+            .update(status=ScrapeJob.RUNNING, last_updated=datetime.utcnow())
+        if not claimed:
+            return None
+        return await ScrapeJob.get(id=job_id)
+
+    async def _run(self, job_id: UUID):
+        job = await self._claim(job_id)
+        if job is None:
+            return
+        await self._update(job, progress=10, attempts=job.attempts + 1)
+        try:
+            data = None if job.force_refresh else await scrape_cache.get(job.ean, job.cost)
+            if data is None:
+                async with browser_pool.lease() as browser:
+                    await self._update(job, progress=30)
+                    await search_ean_on_selleramp(browser, job.ean)
+                    await self._update(job, progress=60)
+                    scraped = await scrape_product_data(browser, job.cost)
+                if not scraped:
+                    raise HTTPException(status_code=500, detail="Product data could not be scraped")
+                data = scraped[0]
+                await scrape_cache.set(job.ean, job.cost, data)
+        except Exception as e:
+            error = e.detail if isinstance(e, HTTPException) else str(e)
+            if job.attempts < self.max_attempts:
+                await self._update(job, status=ScrapeJob.QUEUED, progress=0, error=error)
+                asyncio.get_running_loop().call_later(self.retry_delay, self._queue.put_nowait, job_id)
+            else:
+                await self._update(job, status=ScrapeJob.FAILED, error=error)
+            return
+        await self._update(job, status=ScrapeJob.DONE, progress=100, result=data, error=None)
+
+
+scrape_jobs = ScrapeJobQueue(workers=sa_settings.job_workers, max_attempts=sa_settings.job_max_attempts,
+                             retry_delay=sa_settings.job_retry_delay, stale_after=sa_settings.job_stale_after)
@@ -1,8 +1,15 @@
-from fastapi import APIRouter, HTTPException
+import json
+from typing import List
+from uuid import UUID
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import StreamingResponse
 from src.exceptions import ServerErrorException
 
-from src.driver.services import launch_browser, close_browser, go_to_url, login_to_selleramp, search_ean_on_selleramp,\
-    scrape_product_data
+from src.driver.config import sa_settings
+from src.driver.jobs import scrape_jobs, job_snapshot
+from src.driver.schemas import ScrapeItem
+from src.driver.services import browser_pool, scrape_cache, go_to_url, login_to_selleramp,\
+    search_ean_on_selleramp, cached_scrape_ean, scrape_batch
 
 router = APIRouter(
     prefix="/selenium",
@@ -13,7 +20,8 @@ router = APIRouter(
 @router.on_event("startup")
 async def startup_event():
     try:
-        await launch_browser()
+        await browser_pool.start()
+        await scrape_jobs.start()
         return {"message": f"Successfully started"}
     except Exception as e:
         ServerErrorException(str(e))
@@ -22,7 +30,8 @@ async def startup_event():
 @router.on_event("shutdown")
 async def shutdown_event():
     try:
-        await close_browser()
+        await scrape_jobs.close()
+        await browser_pool.close()
         return {"message": f"Successfully ended"}
     except Exception as e:
         ServerErrorException(str(e))
@@ -31,41 +40,92 @@ async def shutdown_event():
 @router.get("/go_to_url")
 async def go_to_url_route(url: str):
     try:
-        await go_to_url(url)
+        async with browser_pool.lease() as browser:
+            await go_to_url(browser, url)
         return {"message": f"Successfully navigated to {url}"}
+    except HTTPException as e:
+        raise e
     except Exception as e:
-        ServerErrorException(str(e))
+        raise ServerErrorException(str(e))
 
 
 @router.get("/login_selleramp")
 async def login_selleramp():
     try:
-        await login_to_selleramp()
+        async with browser_pool.lease() as browser:
+            await login_to_selleramp(browser)
         return {"status": "ok", "message": "Logged in to SellerAMP successfully."}
     except HTTPException as e:
         raise e
     except Exception as e:
-        ServerErrorException(str(e))
+        raise ServerErrorException(str(e))
 
 
 @router.get("/selleramp/search/{ean}")
 async def search_selleramp(ean: str):
     try:
-        await search_ean_on_selleramp(ean)
+        async with browser_pool.lease() as browser:
+            await search_ean_on_selleramp(browser, ean)
         return {"status": "ok", "message": f"Loaded up data for EAN {ean} successfully"}
     except HTTPException as e:
         raise e
     except Exception as e:
-        ServerErrorException(str(e))
+        raise ServerErrorException(str(e))
 
 
 @router.get("/selleramp/scrape/{cost}")
-async def scrape_selleramp(cost: float):
+async def scrape_selleramp(cost: float, ean: str, force_refresh: bool = False):
     try:
-        data = await scrape_product_data(cost)
+        data = await cached_scrape_ean(ean, cost, force_refresh)
         return {"status": "ok", "message": f"Scraped data successfully. + {data}"}
     except HTTPException as e:
         raise e
     except Exception as e:
-        ServerErrorException(str(e))
+        raise ServerErrorException(str(e))
+
+
+@router.post("/selleramp/batch")
+async def scrape_selleramp_batch(items: List[ScrapeItem], force_refresh: bool = False):
+    if len(items) > sa_settings.batch_limit:
+        raise HTTPException(status_code=413, detail=f"Batch is limited to {sa_settings.batch_limit} products")
+
+    async def ndjson_lines():
+        async for result in scrape_batch(items, force_refresh):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+
+@router.get("/cache/stats")
+async def scrape_cache_stats():
+    return {"status": "ok", "data": scrape_cache.stats()}
+
+
+@router.post("/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def submit_scrape_job(item: ScrapeItem, force_refresh: bool = False):
+    job = await scrape_jobs.submit(item, force_refresh)
+    return {"status": "ok", "data": job_snapshot(job)}
+
+
+@router.get("/jobs/{job_id}")
+async def get_scrape_job(job_id: UUID):
+    job = await scrape_jobs.get(job_id)
+    return {"status": "ok", "data": job_snapshot(job)}
+
+
+@router.get("/jobs/{job_id}/events")
+async def subscribe_scrape_job(job_id: UUID):
+    # Fail before streaming starts so unknown ids still get a 404
+    await scrape_jobs.get(job_id)
+
+    async def ndjson_lines():
+        async for snapshot in scrape_jobs.subscribe(job_id):
+            yield json.dumps(snapshot) + "\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
 
+@router.post("/jobs/{job_id}/retry", status_code=status.HTTP_202_ACCEPTED)
+async def retry_scrape_job(job_id: UUID):
+    job = await scrape_jobs.retry(job_id)
+    return {"status": "ok", "data": job_snapshot(job)}
@@ -0,0 +1,39 @@
+from datetime import datetime
+from pydantic import BaseModel, Field
+from tortoise import fields
+from tortoise.contrib.pydantic import pydantic_model_creator
+from tortoise.models import Model
+
+
+class ScrapeItem(BaseModel):
+    ean: str = Field(..., min_length=1, max_length=30)
+    cost: float = Field(..., gt=0)
+
+
+class ScrapeJob(Model):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    id = fields.UUIDField(pk=True)
+    ean = fields.CharField(max_length=30)
+    cost = fields.FloatField()
+    force_refresh = fields.BooleanField(default=False)
+    status = fields.CharField(max_length=20, default=QUEUED)
+    progress = fields.IntField(default=0)
+    attempts = fields.IntField(default=0)
+    result = fields.JSONField(null=True)
+    error = fields.TextField(null=True)
+    creation_date = fields.DatetimeField(default=datetime.utcnow)
+    last_updated = fields.DatetimeField(default=datetime.utcnow)
+
+    class Meta:
+        table_description = "scrape_job"
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (self.DONE, self.FAILED)
+
+
+scrape_job_pydantic = pydantic_model_creator(ScrapeJob, name="ScrapeJob")
@@ -1,20 +1,26 @@
 import asyncio
+import logging
 import os
-from typing import Optional
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, List, Optional
 from selenium import webdriver
 from selenium.webdriver.firefox.options import Options
-from selenium.webdriver.firefox.service import Service
 from selenium.webdriver.firefox.webdriver import WebDriver
 from fastapi import HTTPException
-from selenium.common import NoSuchElementException, TimeoutException
+from selenium.common import NoSuchElementException, TimeoutException, WebDriverException
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.wait import WebDriverWait
+from src.driver.cache import ScrapeCache
 from src.driver.config import sa_settings
+from src.driver.exceptions import BrowserPoolTimeoutException, BrowserLaunchException
+from src.driver.schemas import ScrapeItem
+
+
+SELLERAMP_LOGIN_URL = "https://sas.selleramp.com/site/login"
+
 
 def load_driver():
     options = Options()
     options.log.level = "trace"
-    options.add_argument("-remote-debugging-port=9224")
     options.add_argument("-headless")
     options.add_argument("-disable-gpu")
     options.add_argument("-no-sandbox")
@@ -22,163 +28,391 @@ def load_driver():
     driver = webdriver.Firefox(firefox_binary=binary, executable_path=os.environ.get('GECKODRIVER_PATH'), options=options)
     return driver
 
-BROWSER: Optional[WebDriver] = None
-wait = WebDriverWait(BROWSER, 1)
 
-async def launch_browser():
-    global BROWSER
-    BROWSER = await asyncio.to_thread(load_driver)
+def load_logged_in_driver():
+    driver = load_driver()
+    try:
+        _login(driver)
+    except Exception:
+        driver.quit()
+        raise
+    return driver
+
+
+def is_alive(browser: WebDriver) -> bool:
+    try:
+        browser.current_url
+        return True
+    except WebDriverException:
+        return False
+
+
+def quit_driver(browser: WebDriver):
+    try:
+        browser.quit()
+    except WebDriverException as e:
+        logging.warning(f"Error while quitting browser: {e}")
+
+
+class BrowserPool:
+    """Fixed number of WebDriver slots, each leased to one caller at a time.
+
+    Idle slots wait in a queue; an empty slot (``None``) means the driver has not
+    been started yet or was discarded after crashing, and is filled on next lease.
+    """
 
+    def __init__(self, size: int, lease_timeout: float, factory: Callable[[], WebDriver] = load_logged_in_driver):
+        self.size = size
+        self.lease_timeout = lease_timeout
+        self.factory = factory
+        self._idle: Optional[asyncio.Queue] = None
+        self._leased = 0
 
+    @property
+    def started(self) -> bool:
+        return self._idle is not None
 
-async def launch_browser():
-    global BROWSER
-    service = Service(executable_path=DRIVER_PATH)
-    BROWSER = webdriver.Firefox(service=service, options=BROWSER_OPTIONS)
+    @property
+    def in_use(self) -> int:
+        return self._leased
 
+    async def start(self, warm: bool = True):
+        if self.started:
+            return
+        self._idle = asyncio.Queue()
+        for _ in range(self.size):
+            self._idle.put_nowait(None)
+        if warm:
+            await self._warm()
 
-async def new_tab():
-    global BROWSER
-    if BROWSER:
-        await asyncio.to_thread(BROWSER.execute_script, "window.open('about:blank', '_blank');")
-        await asyncio.to_thread(BROWSER.switch_to.window, BROWSER.window_handles[-1])
+    async def _warm(self):
+        for _ in range(self.size):
+            self._idle.get_nowait()
+        results = await asyncio.gather(*[asyncio.to_thread(self.factory) for _ in range(self.size)],
+                                       return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logging.warning(f"Could not start pooled browser: {result}")
+                result = None
+            self._idle.put_nowait(result)
 
+    async def close(self):
+        if not self.started:
+            return
+        idle, self._idle = self._idle, None
+        browsers = []
+        while not idle.empty():
+            browser = idle.get_nowait()
+            if browser is not None:
+                browsers.append(browser)
+        await asyncio.gather(*[asyncio.to_thread(quit_driver, browser) for browser in browsers])
 
-async def close_browser():
-    global BROWSER
-    if BROWSER:
-        await asyncio.to_thread(BROWSER.quit)
-        BROWSER = None
+    async def _acquire(self) -> Optional[WebDriver]:
+        if not self.started:
+            await self.start(warm=False)
+        try:
+            return await asyncio.wait_for(self._idle.get(), timeout=self.lease_timeout)
+        except asyncio.TimeoutError:
+            raise BrowserPoolTimeoutException(f"No browser free after {self.lease_timeout}s")
+
+    async def _ensure_healthy(self, browser: Optional[WebDriver]) -> WebDriver:
+        if browser is not None:
+            if await asyncio.to_thread(is_alive, browser):
+                return browser
+            logging.warning("Replacing crashed pooled browser")
+            await asyncio.to_thread(quit_driver, browser)
+        try:
+            return await asyncio.to_thread(self.factory)
+        except Exception as e:
+            raise BrowserLaunchException(str(e))
+
+    @asynccontextmanager
+    async def lease(self):
+        browser = await self._acquire()
+        self._leased += 1
+        try:
+            browser = await self._ensure_healthy(browser)
+            yield browser
+        except Exception:
+            # Keep the session for the next caller unless the failure took the browser down with it
+            if browser is not None and not await asyncio.to_thread(is_alive, browser):
+                await asyncio.to_thread(quit_driver, browser)
+                browser = None
+            raise
+        finally:
+            self._leased -= 1
+            if self._idle is not None:
+                self._idle.put_nowait(browser)
+            elif browser is not None:
+                await asyncio.to_thread(quit_driver, browser)
+
+
+browser_pool = BrowserPool(size=sa_settings.pool_size, lease_timeout=sa_settings.lease_timeout)
+scrape_cache = ScrapeCache(ttl=sa_settings.cache_ttl, maxsize=sa_settings.cache_size)
 
 
-async def close_tab():
-    global BROWSER
-    if BROWSER:
-        await asyncio.to_thread(BROWSER.execute_script, "window.close();")
-        await asyncio.to_thread(BROWSER.switch_to.window, BROWSER.window_handles[-1])
+async def new_tab(browser: WebDriver):
+    await asyncio.to_thread(browser.execute_script, "window.open('about:blank', '_blank');")
+    await asyncio.to_thread(browser.switch_to.window, browser.window_handles[-1])
 
 
-async def go_to_url(url: str):
-    global BROWSER
-    if BROWSER:
-        await asyncio.to_thread(BROWSER.get, url)
+async def close_tab(browser: WebDriver):
+    await asyncio.to_thread(browser.execute_script, "window.close();")
+    await asyncio.to_thread(browser.switch_to.window, browser.window_handles[-1])
 
 
-async def login_to_selleramp():
+async def go_to_url(browser: WebDriver, url: str):
+    await asyncio.to_thread(browser.get, url)
+
+
+def _login(browser: WebDriver):
+    # Check if already on the login page
+    if browser.current_url != SELLERAMP_LOGIN_URL:
+        # Navigate to the login page
+        browser.get(SELLERAMP_LOGIN_URL)
+    # Find the email field and enter the email
+    email = browser.find_element(By.XPATH, "//*[@id='loginform-email']")
+    email.send_keys(sa_settings.sas_email)
+    # Find the password field and enter the password
+    password = browser.find_element(By.XPATH, "//*[@id='loginform-password']")
+    password.send_keys(sa_settings.sas_pass)
+    # Click the login button
+    login = browser.find_element(By.XPATH, "//*[@id='login-form']/div[5]/button")
+    login.click()
+
+
+async def login_to_selleramp(browser: WebDriver):
     try:
-        # Create a new tab
-        await new_tab()
-        # Check if already on the login page
-        if BROWSER.current_url != "https://sas.selleramp.com/site/login":
-            # Navigate to the login page
-            await go_to_url("https://sas.selleramp.com/site/login")
-        # Find the email field and enter the email
-        email = BROWSER.find_element(By.XPATH, "//*[@id='loginform-email']")
-        email.send_keys(sa_settings.sas_email)
-        # Find the password field and enter the password
-        password = BROWSER.find_element(By.XPATH, "//*[@id='loginform-password']")
-        password.send_keys(sa_settings.sas_pass)
-        # Click the login button
-        login = BROWSER.find_element(By.XPATH, "//*[@id='login-form']/div[5]/button")
-        login.click()
+        await asyncio.to_thread(_login, browser)
     except Exception as e:
         print(f"Error logging in to SellerAMP: {e}")
         raise HTTPException(status_code=500, detail="Error logging in to SellerAMP")
 
 
-async def search_ean_on_selleramp(ean: str):
+def _search_ean(browser: WebDriver, ean: str):
+    # Check if the current URL matches the selleramp search URL
+    if "https://sas.selleramp.com/" not in browser.current_url:
+        # Navigate to the login page
+        url = "https://sas.selleramp.com/"
+        browser.get(url)
+    # Find the search field and enter the EAN
+    search_field = browser.find_element(By.XPATH, "//*[@id='saslookup-search_term']")
+    search_field.clear()
+    search_field.send_keys(ean)
+    # Click the search button
     try:
-        # Check if the current URL matches the selleramp search URL
-        if "https://sas.selleramp.com/" not in BROWSER.current_url:
-            # Navigate to the login page
-            url = "https://sas.selleramp.com/"
-            await go_to_url(url)
-        # Find the search field and enter the EAN
-        search_field = BROWSER.find_element(By.XPATH, "//*[@id='saslookup-search_term']")
-        search_field.clear()
-        search_field.send_keys(ean)
-        # Click the search button
+        search_button = browser.find_element(By.XPATH,
+                                             "/html/body/div[2]/div/div/div[2]/form/div/div/div/div/div/div[2]/button")
+    except NoSuchElementException:
         try:
-            search_button = BROWSER.find_element(By.XPATH,
-                                                 "/html/body/div[2]/div/div/div[2]/form/div/div/div/div/div/div[2]/button")
-        except NoSuchElementException:
-            try:
-                search_button = BROWSER.find_element(By.XPATH,
+            search_button = browser.find_element(By.XPATH,
                                                  "/html/body/div[2]/div/div/form/div[2]/div/div/div/div/div/div/div/div[2]/button")
-            except NoSuchElementException:
-                search_button = BROWSER.find_element(By.XPATH, "/html/body/div[2]/div/div/div[2]/form/h1/div/div/div[1]/div[2]/button[1]")
-        search_button.click()
-
-        # Check if product loaded
-        if "https://sas.selleramp.com/sas/lookup/" not in BROWSER.current_url:
-            try:
-                # Wait for the search results to load
-                search_results = BROWSER.find_elements(By.XPATH, "//div[@id='search-results']/ul/li")
-                print(search_results)
-                if len(search_results) > 0:
-                    # Click on the first product in the search results
-                    product = search_results[0].find_element(By.XPATH, ".//a")
-                    product.click()
-            except (NoSuchElementException, TimeoutException) as e:
-                raise HTTPException(status_code=500, detail=f"Error while searching for EAN {ean}")
+        except NoSuchElementException:
+            search_button = browser.find_element(By.XPATH, "/html/body/div[2]/div/div/div[2]/form/h1/div/div/div[1]/div[2]/button[1]")
+    search_button.click()
+
+    # Check if product loaded
+    if "https://sas.selleramp.com/sas/lookup/" not in browser.current_url:
+        try:
+            # Wait for the search results to load
+            search_results = browser.find_elements(By.XPATH, "//div[@id='search-results']/ul/li")
+            if len(search_results) > 0:
+                # Click on the first product in the search results
+                product = search_results[0].find_element(By.XPATH, ".//a")
+                product.click()
+        except (NoSuchElementException, TimeoutException) as e:
+            raise HTTPException(status_code=500, detail=f"Error while searching for EAN {ean}")
+
+
+async def search_ean_on_selleramp(browser: WebDriver, ean: str):
+    try:
+        await asyncio.to_thread(_search_ean, browser, ean)
     except Exception as e:
         print(f"Error searching for EAN {ean} on SellerAMP: {e}")
         raise HTTPException(status_code=500, detail=f"No result or exception for EAN {ean} on SellerAMP")
 
 
-async def scrape_product_data(cost_input: float):
+def _scrape_product_elements(browser: WebDriver, cost_input: float) -> List[dict]:
+    scraped_data = []
+    ean = browser.find_element(By.XPATH, "//*[@id='pdb-ean-input']").text
+    price = browser.find_element(By.XPATH, "//*[@id='qi_sale_price']").text
+    # Enter the price in the cost field
+    cost = browser.find_element(By.XPATH, "//*[@id='qi_cost']")
+    cost.clear()
+    cost.send_keys(cost_input)
+    product = browser.find_element(By.XPATH, "//div[@class='pdb-title product-title']")
+    asin = browser.find_element(By.XPATH, "//*[@id='pdb-asin-input']")
+    alerts = browser.find_element(By.XPATH, "//*[@id='qi-alerts']/ul")
+    bsr = browser.find_element(By.XPATH, "//*[@id='qi-bsr']")
+    est = browser.find_element(By.XPATH, "//*[@id='qi-estimated-sales']/span")
+    profit = float(browser.find_element(By.XPATH, "//*[@id='qi-profit']")
+                   .text.replace('£', ''))
+    roi = browser.find_element(By.XPATH, "//*[@id='qi-roi']")
+    reviewCount = browser.find_element(By.XPATH, "//*[@id='product-details-box']/div[3]/div[2]/span[2]")
+    # Find the rating element and its children (the stars)
+    rating_element = browser.find_element(By.XPATH, "//*[@id='product-details-box']/div[3]/div[2]/span[1]")
+    stars = rating_element.find_elements(By.TAG_NAME, "i")
+    reviews = _rating_from_star_classes([star.get_attribute("class") for star in stars])
+    fbaSellers = browser.find_element(By.XPATH, "//*[@id='keepa_csv_type_10']")
+    fbmSellers = browser.find_element(By.XPATH, "//*[@id='keepa_csv_type_7']")
+    amazon = browser.find_element(By.XPATH, "//*[@id='keepa_csv_type_0']")
+    scraped_data.append({
+        'asin': asin.text,
+        'ean': ean,
+        'price': price,
+        'product': product.text,
+        'reviews': reviews,
+        'reviewCount': reviewCount.text,
+        'alerts': alerts.text,
+        'est': est.text,
+        'bsr': bsr.text,
+        'profit': profit,
+        'roi': roi.text.replace('%', ''),
+        'fbaSellers': fbaSellers.text,
+        'fbmSellers': fbmSellers.text,
+        'amazon': amazon.text
+    })
+    return scraped_data
+
+
+# Reads every field the element-by-element scraper reads, in a single WebDriver round trip
+EXTRACT_PRODUCT_SCRIPT = """
+const fields = {
+    ean: "//*[@id='pdb-ean-input']",
+    price: "//*[@id='qi_sale_price']",
+    product: "//div[@class='pdb-title product-title']",
+    asin: "//*[@id='pdb-asin-input']",
+    alerts: "//*[@id='qi-alerts']/ul",
+    bsr: "//*[@id='qi-bsr']",
+    est: "//*[@id='qi-estimated-sales']/span",
+    profit: "//*[@id='qi-profit']",
+    roi: "//*[@id='qi-roi']",
+    reviewCount: "//*[@id='product-details-box']/div[3]/div[2]/span[2]",
+    rating: "//*[@id='product-details-box']/div[3]/div[2]/span[1]",
+    fbaSellers: "//*[@id='keepa_csv_type_10']",
+    fbmSellers: "//*[@id='keepa_csv_type_7']",
+    amazon: "//*[@id='keepa_csv_type_0']"
+};
+const result = {missing: [], text: {}, stars: []};
+for (const [name, xpath] of Object.entries(fields)) {
+    const node = document.evaluate(xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    if (node === null) {
+        result.missing.push(xpath);
+        continue;
+    }
+    result.text[name] = node.innerText.trim();
+    if (name === "rating") {
+        result.stars = Array.from(node.getElementsByTagName("i"), star => star.getAttribute("class") || "");
+    }
+}
+return result;
+"""
+
+
+def _rating_from_star_classes(star_classes: List[str]) -> float:
+    reviews = 0
+    for classes in star_classes:
+        if "fa-star-half-empty" in classes:
+            reviews += 0.5
+        elif "fa-star-o" in classes:
+            reviews += 0
+        else:
+            reviews += 1
+    return reviews
+
+
+def _scrape_product_script(browser: WebDriver, cost_input: float) -> List[dict]:
+    # Enter the price in the cost field, the page recalculates profit and ROI from it
+    cost = browser.find_element(By.XPATH, "//*[@id='qi_cost']")
+    cost.clear()
+    cost.send_keys(cost_input)
+    page = browser.execute_script(EXTRACT_PRODUCT_SCRIPT)
+    if page["missing"]:
+        raise NoSuchElementException(f"Unable to locate element: {page['missing'][0]}")
+    text = page["text"]
+    return [{
+        'asin': text['asin'],
+        'ean': text['ean'],
+        'price': text['price'],
+        'product': text['product'],
+        'reviews': _rating_from_star_classes(page["stars"]),
+        'reviewCount': text['reviewCount'],
+        'alerts': text['alerts'],
+        'est': text['est'],
+        'bsr': text['bsr'],
+        'profit': float(text['profit'].replace('£', '')),
+        'roi': text['roi'].replace('%', ''),
+        'fbaSellers': text['fbaSellers'],
+        'fbmSellers': text['fbmSellers'],
+        'amazon': text['amazon']
+    }]
+
+
+SCRAPE_MODES = {
+    "script": _scrape_product_script,
+    "elements": _scrape_product_elements,
+}
+
+
+async def scrape_product_data(browser: WebDriver, cost_input: float, mode: str = None):
+    scrape = SCRAPE_MODES[mode or sa_settings.scrape_mode]
     try:
-        scraped_data = []
-        ean = BROWSER.find_element(By.XPATH, "//*[@id='pdb-ean-input']").text
-        price = BROWSER.find_element(By.XPATH, "//*[@id='qi_sale_price']").text
-        # Enter the price in the cost field
-        cost = BROWSER.find_element(By.XPATH, "//*[@id='qi_cost']")
-        cost.clear()
-        cost.send_keys(cost_input)
-        product = BROWSER.find_element(By.XPATH, "//div[@class='pdb-title product-title']")
-        asin = BROWSER.find_element(By.XPATH, "//*[@id='pdb-asin-input']")
-        alerts = BROWSER.find_element(By.XPATH, "//*[@id='qi-alerts']/ul")
-        bsr = BROWSER.find_element(By.XPATH, "//*[@id='qi-bsr']")
-        est = BROWSER.find_element(By.XPATH, "//*[@id='qi-estimated-sales']/span")
-        profit = float(BROWSER.find_element(By.XPATH, "//*[@id='qi-profit']")
-                       .text.replace('£', ''))
-        roi = BROWSER.find_element(By.XPATH, "//*[@id='qi-roi']")
-        reviewCount = BROWSER.find_element(By.XPATH, "//*[@id='product-details-box']/div[3]/div[2]/span[2]")
-        # Find the rating element and its children (the stars)
-        rating_element = BROWSER.find_element(By.XPATH, "//*[@id='product-details-box']/div[3]/div[2]/span[1]")
-        stars = rating_element.find_elements(By.TAG_NAME, "i")
-        # Initialize a variable to store the rating
-        reviews = 0
-        # Iterate through the stars and add their values to the rating
-        for star in stars:
-            classes = star.get_attribute("class")
-            if "fa-star-half-empty" in classes:
-                reviews += 0.5
-            elif "fa-star-o" in classes:
-                reviews += 0
-            else:
-                reviews += 1
-        fbaSellers = BROWSER.find_element(By.XPATH, "//*[@id='keepa_csv_type_10']")
-        fbmSellers = BROWSER.find_element(By.XPATH, "//*[@id='keepa_csv_type_7']")
-        amazon = BROWSER.find_element(By.XPATH, "//*[@id='keepa_csv_type_0']")
-        scraped_data.append({
-            'asin': asin,
-            'ean': ean,
-            'price': price,
-            'product': product.text,
-            'reviews': reviews,
-            'reviewCount': reviewCount.text,
-            'alerts': alerts.text,
-            'est': est.text,
-            'bsr': bsr.text,
-            'profit': profit,
-            'roi': roi.text.replace('%', ''),
-            'fbaSellers': fbaSellers.text,
-            'fbmSellers': fbmSellers.text,
-            'amazon': amazon.text
-        })
-        return scraped_data
+        return await asyncio.to_thread(scrape, browser, cost_input)
     except NoSuchElementException as e:
         print(e)
     except Exception as e:
         print(e)
+
+
+async def scrape_ean(ean: str, cost: float) -> Optional[dict]:
+    # Search and scrape on the same leased browser so no other request can move its page in between
+    async with browser_pool.lease() as browser:
+        await search_ean_on_selleramp(browser, ean)
+        data = await scrape_product_data(browser, cost)
+    return data[0] if data else None
+
+
+async def cached_scrape_ean(ean: str, cost: float, force_refresh: bool = False) -> Optional[dict]:
+    if not force_refresh:
+        data = await scrape_cache.get(ean, cost)
+        if data is not None:
+            return data
+    data = await scrape_ean(ean, cost)
+    if data is not None:
+        await scrape_cache.set(ean, cost, data)
+    return data
+
+
+async def _scrape_item(item: ScrapeItem, force_refresh: bool) -> dict:
+    result = {"ean": item.ean, "cost": item.cost}
+    try:
+        data = await cached_scrape_ean(item.ean, item.cost, force_refresh)
+    except HTTPException as e:
+        return {**result, "status": "error", "detail": e.detail}
+    except Exception as e:
+        logging.exception(f"Error scraping EAN {item.ean}: {e}")
+        return {**result, "status": "error", "detail": "Error while scraping product"}
+    if data is None:
+        return {**result, "status": "error", "detail": "Product data could not be scraped"}
+    return {**result, "status": "ok", "data": data}
+
+
+async def scrape_batch(items: List[ScrapeItem], force_refresh: bool = False) -> AsyncIterator[dict]:
+    # One worker per pooled browser; results are yielded in completion order, not request order
+    pending: asyncio.Queue = asyncio.Queue()
+    for item in items:
+        pending.put_nowait(item)
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def worker():
+        while not pending.empty():
+            item = pending.get_nowait()
+            await results.put(await _scrape_item(item, force_refresh))
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(browser_pool.size, len(items)))]
+    try:
+        for _ in range(len(items)):
+            yield await results.get()
+    finally:
+        for task in workers:
+            task.cancel()
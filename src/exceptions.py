@@ -40,3 +40,21 @@ class ServerErrorException(HTTPException):
     def __init__(self, error_message: str):
         super().__init__(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
         logging.exception(f"ServerErrorException: {error_message}")
+
+
+class InvalidCursorException(HTTPException):
+    def __init__(self, error_message: str):
+        super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor")
+        logging.exception(f"InvalidCursorException: {error_message}")
+
+
+class FileTooLargeException(HTTPException):
+    def __init__(self, error_message: str):
+        super().__init__(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="File is too large")
+        logging.exception(f"FileTooLargeException: {error_message}")
+
+
+class InvalidImageException(HTTPException):
+    def __init__(self, error_message: str):
+        super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail="File is not a readable image")
+        logging.exception(f"InvalidImageException: {error_message}")
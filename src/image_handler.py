@@ -0,0 +1,134 @@
+import asyncio
+import hashlib
+import io
+import json
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from fastapi import UploadFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+from src.config import settings
+from src.exceptions import FileTooLargeException, InvalidImageException
+from src.storage import storage
+
+
+ALLOWED_EXTENSIONS = ["jpg", "png", "jpeg", "webp"]
+# name: (box, crop to fill the box), thumbnails are square for grids, larger sizes keep their aspect ratio
+IMAGE_VARIANTS = {
+    "thumbnail": ((200, 200), True),
+    "list": ((400, 400), False),
+    "detail": ((800, 800), False),
+}
+IMAGE_FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+READ_CHUNK_SIZE = 64 * 1024
+
+_executor: Optional[Executor] = None
+# Caps the images decoded at once, queued uploads wait here holding only their raw bytes
+_processing_slots = asyncio.Semaphore(settings.image_max_concurrency)
+
+
+def get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        if settings.image_executor == "thread":
+            _executor = ThreadPoolExecutor(max_workers=settings.image_workers, thread_name_prefix="image")
+        else:
+            _executor = ProcessPoolExecutor(max_workers=settings.image_workers)
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def file_extension(filename: str) -> str:
+    return filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+
+
+def content_digest(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def variant_key(digest: str, name: str) -> str:
+    return f"images/{digest[:2]}/{digest}/{name}"
+
+
+def render_variants(content: bytes, quality: int) -> Dict[str, Tuple[int, Dict[str, bytes]]]:
+    # Runs in the pool, so it only takes and returns plain data
+    rendered = {}
+    with Image.open(io.BytesIO(content)) as img:
+        img = ImageOps.exif_transpose(img)
+        img.load()
+    for name, (box, crop) in IMAGE_VARIANTS.items():
+        if crop:
+            resized = ImageOps.fit(img, box)
+        else:
+            resized = img.copy()
+            resized.thumbnail(box)
+        encoded = {}
+        for image_format, pil_format in IMAGE_FORMATS.items():
+            output = io.BytesIO()
+            if pil_format == "JPEG" and resized.mode != "RGB":
+                # JPEG has no alpha, flatten transparent images onto white
+                flat = Image.new("RGB", resized.size, "white")
+                flat.paste(resized, mask=resized.convert("RGBA").getchannel("A"))
+                flat.save(output, format=pil_format, quality=quality, optimize=True)
+            else:
+                resized.save(output, format=pil_format, quality=quality)
+            encoded[image_format] = output.getvalue()
+        rendered[name] = (resized.width, encoded)
+    return rendered
+
+
+async def read_upload(file: UploadFile, max_bytes: int = settings.image_max_bytes) -> bytes:
+    chunks, total = [], 0
+    while chunk := await file.read(READ_CHUNK_SIZE):
+        total += len(chunk)
+        if total > max_bytes:
+            raise FileTooLargeException(f"Upload {file.filename} is over {max_bytes} bytes")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+async def process_image(content: bytes) -> Dict[str, Tuple[int, Dict[str, bytes]]]:
+    async with _processing_slots:
+        try:
+            return await asyncio.get_running_loop().run_in_executor(get_executor(), render_variants, content,
+                                                                    settings.image_quality)
+        except (UnidentifiedImageError, OSError, ValueError) as e:
+            raise InvalidImageException(str(e))
+
+
+async def _write_variants(digest: str, rendered: Dict[str, Tuple[int, Dict[str, bytes]]]) -> Dict[str, int]:
+    await asyncio.gather(*(storage.put(variant_key(digest, f"{name}.{image_format}"), content)
+                           for name, (_, encoded) in rendered.items() for image_format, content in encoded.items()))
+    # Written last, its presence means every variant is in place
+    widths = {name: width for name, (width, _) in rendered.items()}
+    await storage.put(variant_key(digest, "manifest.json"), json.dumps({"widths": widths}).encode())
+    return widths
+
+
+def image_urls(digest: str, widths: Dict[str, int]) -> dict:
+    urls = {name: {image_format: storage.url(variant_key(digest, f"{name}.{image_format}"))
+                   for image_format in IMAGE_FORMATS}
+            for name in IMAGE_VARIANTS}
+    urls["srcset"] = {
+        image_format: ", ".join(f"{urls[name][image_format]} {widths[name]}w" for name in IMAGE_VARIANTS)
+        for image_format in IMAGE_FORMATS
+    }
+    return urls
+
+
+async def store_image(file: UploadFile) -> Tuple[str, dict]:
+    """Stores every variant of an upload under its content hash, returns the hash and the URL map."""
+    content = await read_upload(file)
+    digest = content_digest(content)
+    manifest = await storage.get(variant_key(digest, "manifest.json"))
+    if manifest is not None:
+        # Same bytes uploaded before, nothing to decode or write
+        widths = json.loads(manifest)["widths"]
+    else:
+        widths = await _write_variants(digest, await process_image(content))
+    return digest, image_urls(digest, widths)
@@ -1,6 +1,5 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from tortoise.contrib.fastapi import register_tortoise
 from starlette.responses import RedirectResponse
 from src.auth import router as auth
@@ -12,6 +11,8 @@ from src.todos import router as todos
 from src.user import router as user
 from src.wholesale import router as wholesale
 from src.config import settings
+from src.image_handler import shutdown_executor
+from src.static_handler import CachedStaticFiles
 import certifi
 import os
 
@@ -31,7 +32,12 @@ app.add_middleware(
 
 
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", CachedStaticFiles(directory="static"), name="static")
+
+
+@app.on_event("shutdown")
+def close_image_executor():
+    shutdown_executor()
 
 
 @app.get("/")
@@ -39,6 +45,16 @@ def docs():
     return RedirectResponse(url='/docs')
 
 
+# Registered before the routers so the database is ready when their startup handlers run
+register_tortoise(
+    app,
+    db_url=settings.postgresql_url,
+    modules={'models': ['src.models', 'src.business.schemas', 'src.wholesale.schemas', 'src.user.schemas', 'src.todos.schemas', 'src.tasks.schemas', 'src.driver.schemas']},
+    generate_schemas=True,
+    add_exception_handlers=True
+)
+
+
 app.include_router(auth.router)
 app.include_router(business.router)
 app.include_router(csvhandler.router)
@@ -47,12 +63,3 @@ app.include_router(tasks.router)
 app.include_router(todos.router)
 app.include_router(user.router)
 app.include_router(wholesale.router)
-
-
-register_tortoise(
-    app,
-    db_url=settings.postgresql_url,
-    modules={'models': ['src.models', 'src.business.schemas', 'src.wholesale.schemas', 'src.user.schemas', 'src.todos.schemas', 'src.tasks.schemas']},
-    generate_schemas=True,
-    add_exception_handlers=True
-)
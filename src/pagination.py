@@ -0,0 +1,57 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+from tortoise.expressions import Q
+from tortoise.queryset import QuerySet
+from src.exceptions import InvalidCursorException
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(sort: str, value, last_id: int) -> str:
+    if isinstance(value, datetime):
+        payload = {"sort": sort, "value": value.isoformat(), "type": "datetime", "id": last_id}
+    else:
+        payload = {"sort": sort, "value": value, "id": last_id}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[object, int]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if payload["sort"] != sort:
+            raise InvalidCursorException(f"Cursor was issued for sort {payload['sort']}, not {sort}")
+        value = payload["value"]
+        if payload.get("type") == "datetime":
+            value = datetime.fromisoformat(value)
+        return value, int(payload["id"])
+    except (binascii.Error, ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorException(str(e))
+
+
+def _after(field: str, descending: bool, value, last_id: int) -> Q:
+    # Rows strictly past the cursor in (field, id) order, id breaks ties between equal sort values
+    direction = "lt" if descending else "gt"
+    if field == "id":
+        return Q(**{f"id__{direction}": last_id})
+    return Q(**{f"{field}__{direction}": value}) | Q(**{field: value, f"id__{direction}": last_id})
+
+
+async def paginate(queryset: QuerySet, pydantic_model, sort: str = "id", cursor: Optional[str] = None,
+                   limit: int = DEFAULT_PAGE_SIZE) -> Tuple[List, Optional[str]]:
+    descending = sort.startswith("-")
+    field = sort.lstrip("-")
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort)
+        queryset = queryset.filter(_after(field, descending, value, last_id))
+    ordering = [sort] if field == "id" else [sort, "-id" if descending else "id"]
+    # One extra row tells whether another page exists without a COUNT query
+    items = await pydantic_model.from_queryset(queryset.order_by(*ordering).limit(limit + 1))
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    return items, encode_cursor(sort, getattr(items[-1], field), items[-1].id)
@@ -0,0 +1,149 @@
+import asyncio
+import hashlib
+import mimetypes
+import os
+import re
+import stat
+from email.utils import formatdate
+from typing import Iterator, Optional, Tuple
+from cachetools import LRUCache
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response, StreamingResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+from src.config import settings
+
+
+# Files under these folders are named after their content, so a URL always serves the same bytes
+IMMUTABLE_PREFIXES = ("images/",)
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+READ_CHUNK_SIZE = 64 * 1024
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def file_etag(stat_result: os.stat_result) -> str:
+    return '"' + hashlib.md5(f"{stat_result.st_mtime}-{stat_result.st_size}".encode()).hexdigest() + '"'
+
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    candidates = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) of a single byte range, None to serve the whole file."""
+    match = RANGE_PATTERN.match(header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        # Malformed or multi-range requests get the full file, which is always allowed
+        return None
+    first, last = match.groups()
+    if first == "":
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(f"Range {header} not satisfiable for {size} bytes")
+    return start, end
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _iter_file(path: str, start: int, end: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(READ_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles with long-lived caching for content-addressed files, byte ranges and an in-memory LRU."""
+
+    def __init__(self, *args, cache_bytes: int = settings.static_cache_bytes,
+                 max_file_bytes: int = settings.static_cache_max_file_bytes, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_file_bytes = max_file_bytes
+        self.cache = LRUCache(maxsize=cache_bytes, getsizeof=lambda entry: len(entry[1]))
+        self.hits = 0
+        self.misses = 0
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if scope["method"] in ("GET", "HEAD"):
+            try:
+                full_path, stat_result = await asyncio.to_thread(self.lookup_path, path)
+            except OSError:
+                full_path, stat_result = None, None
+            if stat_result and stat.S_ISREG(stat_result.st_mode):
+                return await self.cached_file_response(path, full_path, stat_result, scope)
+        # Directories, 404s and bad methods behave as before
+        return await super().get_response(path, scope)
+
+    async def _content(self, full_path: str, etag: str) -> bytes:
+        entry = self.cache.get(full_path)
+        if entry is not None and entry[0] == etag:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        content = await asyncio.to_thread(_read_file, full_path)
+        try:
+            self.cache[full_path] = (etag, content)
+        except ValueError:
+            # Larger than the whole cache budget
+            pass
+        return content
+
+    async def cached_file_response(self, path: str, full_path: str, stat_result: os.stat_result,
+                                   scope: Scope) -> Response:
+        request_headers = Headers(scope=scope)
+        size = stat_result.st_size
+        etag = file_etag(stat_result)
+        headers = {
+            "etag": etag,
+            "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+            "accept-ranges": "bytes",
+            "cache-control": IMMUTABLE_CACHE_CONTROL if path.startswith(IMMUTABLE_PREFIXES)
+            else REVALIDATE_CACHE_CONTROL,
+        }
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            if etag_matches(etag, if_none_match):
+                return NotModifiedResponse(Headers(headers))
+        elif self.is_not_modified(Headers(headers), request_headers):
+            return NotModifiedResponse(Headers(headers))
+
+        byte_range = None
+        if "range" in request_headers and request_headers.get("if-range", etag) == etag:
+            try:
+                byte_range = parse_range(request_headers["range"], size)
+            except ValueError:
+                headers["content-range"] = f"bytes */{size}"
+                return Response(status_code=416, headers=headers)
+
+        media_type = mimetypes.guess_type(full_path)[0] or "text/plain"
+        head = scope["method"] == "HEAD"
+        status_code, start, end = 200, 0, size - 1
+        if byte_range is not None:
+            status_code, (start, end) = 206, byte_range
+            headers["content-range"] = f"bytes {start}-{end}/{size}"
+        headers["content-length"] = str(end - start + 1)
+        if head:
+            return Response(status_code=status_code, headers=headers, media_type=media_type)
+        if size <= self.max_file_bytes:
+            content = await self._content(full_path, etag)
+            return Response(content[start:end + 1], status_code=status_code, headers=headers, media_type=media_type)
+        if byte_range is None:
+            return FileResponse(full_path, stat_result=stat_result, headers=headers, media_type=media_type)
+        return StreamingResponse(_iter_file(full_path, start, end), status_code=status_code, headers=headers,
+                                 media_type=media_type)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.cache),
+                "bytes": self.cache.currsize, "max_bytes": self.cache.maxsize}
@@ -0,0 +1,225 @@
+import asyncio
+import mimetypes
+import os
+import shutil
+from typing import AsyncIterable, Iterable, Optional
+from src.config import settings
+
+
+DEFAULT_LOCAL_ROOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+# S3 rejects multipart parts under 5 MiB, except the last one
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+def content_type(key: str) -> str:
+    return mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+
+class Storage:
+    """Uploaded files addressed by "/"-separated keys such as "images/ab/<hash>/thumbnail.webp"."""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+    async def put(self, key: str, content: bytes):
+        raise NotImplementedError
+
+    async def put_stream(self, key: str, chunks: AsyncIterable[bytes]):
+        raise NotImplementedError
+
+    async def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+    async def delete_prefix(self, prefix: str):
+        raise NotImplementedError
+
+    async def delete_prefixes(self, prefixes: Iterable[str]):
+        for prefix in prefixes:
+            await self.delete_prefix(prefix)
+
+
+class LocalStorage(Storage):
+    def __init__(self, root: str, base_url: str):
+        super().__init__(base_url)
+        self.root = os.path.abspath(root)
+
+    def path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if os.path.commonpath([self.root, path]) != self.root:
+            raise ValueError(f"Storage key {key} is outside {self.root}")
+        return path
+
+    def _write(self, key: str, content: bytes):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written aside and renamed so concurrent writers of the same key never leave half a file
+        partial = f"{path}.{os.getpid()}.part"
+        with open(partial, "wb") as f:
+            f.write(content)
+        os.replace(partial, path)
+
+    async def put(self, key: str, content: bytes):
+        await asyncio.to_thread(self._write, key, content)
+
+    async def put_stream(self, key: str, chunks: AsyncIterable[bytes]):
+        path = self.path(key)
+        await asyncio.to_thread(os.makedirs, os.path.dirname(path), exist_ok=True)
+        partial = f"{path}.{os.getpid()}.part"
+        f = await asyncio.to_thread(open, partial, "wb")
+        try:
+            async for chunk in chunks:
+                await asyncio.to_thread(f.write, chunk)
+        except BaseException:
+            f.close()
+            os.remove(partial)
+            raise
+        f.close()
+        await asyncio.to_thread(os.replace, partial, path)
+
+    def _read(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self.path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._read, key)
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(os.path.isfile, self.path(key))
+
+    def _remove(self, key: str):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self._remove, key)
+
+    async def delete_prefix(self, prefix: str):
+        await asyncio.to_thread(shutil.rmtree, self.path(prefix), ignore_errors=True)
+
+
+class S3Storage(Storage):
+    """Any S3-compatible bucket, boto3 calls run on threads so they never block the event loop."""
+
+    def __init__(self, bucket: str, base_url: str, prefix: str = "", part_size: int = MIN_PART_SIZE,
+                 client=None, **client_options):
+        super().__init__(base_url)
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self._client = client
+        self._client_options = client_options
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+            self._client = boto3.client("s3", **self._client_options)
+        return self._client
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key
+
+    @staticmethod
+    def _is_missing(error: Exception) -> bool:
+        response = getattr(error, "response", None) or {}
+        return response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+    async def put(self, key: str, content: bytes):
+        await asyncio.to_thread(self.client.put_object, Bucket=self.bucket, Key=self._key(key), Body=content,
+                                ContentType=content_type(key))
+
+    async def put_stream(self, key: str, chunks: AsyncIterable[bytes]):
+        # Parts go out as soon as part_size bytes are buffered, a stream shorter than one part is a plain put
+        buffer, parts, upload_id = bytearray(), [], None
+        try:
+            async for chunk in chunks:
+                buffer.extend(chunk)
+                while len(buffer) >= self.part_size:
+                    if upload_id is None:
+                        upload = await asyncio.to_thread(self.client.create_multipart_upload, Bucket=self.bucket,
+                                                         Key=self._key(key), ContentType=content_type(key))
+                        upload_id = upload["UploadId"]
+                    parts.append(await self._upload_part(key, upload_id, len(parts) + 1,
+                                                         bytes(buffer[:self.part_size])))
+                    del buffer[:self.part_size]
+            if upload_id is None:
+                await self.put(key, bytes(buffer))
+                return
+            if buffer:
+                parts.append(await self._upload_part(key, upload_id, len(parts) + 1, bytes(buffer)))
+            await asyncio.to_thread(self.client.complete_multipart_upload, Bucket=self.bucket, Key=self._key(key),
+                                    UploadId=upload_id, MultipartUpload={"Parts": parts})
+        except BaseException:
+            if upload_id is not None:
+                await asyncio.to_thread(self.client.abort_multipart_upload, Bucket=self.bucket, Key=self._key(key),
+                                        UploadId=upload_id)
+            raise
+
+    async def _upload_part(self, key: str, upload_id: str, number: int, content: bytes) -> dict:
+        part = await asyncio.to_thread(self.client.upload_part, Bucket=self.bucket, Key=self._key(key),
+                                       UploadId=upload_id, PartNumber=number, Body=content)
+        return {"ETag": part["ETag"], "PartNumber": number}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        try:
+            response = await asyncio.to_thread(self.client.get_object, Bucket=self.bucket, Key=self._key(key))
+        except Exception as e:
+            if self._is_missing(e):
+                return None
+            raise
+        return await asyncio.to_thread(response["Body"].read)
+
+    async def exists(self, key: str) -> bool:
+        try:
+            await asyncio.to_thread(self.client.head_object, Bucket=self.bucket, Key=self._key(key))
+        except Exception as e:
+            if self._is_missing(e):
+                return False
+            raise
+        return True
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self.client.delete_object, Bucket=self.bucket, Key=self._key(key))
+
+    def _delete_prefix(self, prefix: str):
+        paginator = self.client.get_paginator("list_objects_v2")
+        # A page holds at most 1000 keys, which is also the delete_objects limit
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._key(prefix.rstrip("/") + "/")):
+            objects = [{"Key": item["Key"]} for item in page.get("Contents", [])]
+            if objects:
+                self.client.delete_objects(Bucket=self.bucket, Delete={"Objects": objects, "Quiet": True})
+
+    async def delete_prefix(self, prefix: str):
+        await asyncio.to_thread(self._delete_prefix, prefix)
+
+
+def create_storage() -> Storage:
+    if settings.storage_backend == "s3":
+        return S3Storage(
+            bucket=settings.storage_s3_bucket,
+            base_url=settings.storage_base_url,
+            prefix=settings.storage_s3_prefix,
+            part_size=settings.storage_s3_part_size,
+            endpoint_url=settings.storage_s3_endpoint_url,
+            region_name=settings.storage_s3_region,
+            aws_access_key_id=settings.storage_s3_access_key_id,
+            aws_secret_access_key=settings.storage_s3_secret_access_key,
+        )
+    return LocalStorage(settings.storage_local_root or DEFAULT_LOCAL_ROOT, settings.storage_base_url)
+
+
+storage = create_storage()
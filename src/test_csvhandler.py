@@ -1,37 +1,96 @@
 import io
 import pytest
-from fastapi import UploadFile
+import pytest_asyncio
 from fastapi.testclient import TestClient
-from main import app  # Replace "main" with the name of your main FastAPI app file
+from tortoise import Tortoise
+from src.main import app
+from src.csvhandler.exceptions import CsvFileException, CsvMappingException
+from src.csvhandler.services import CsvStream, ProductCsvImport, import_wholesale_products
+from src.user.schemas import User
+from src.wholesale.schemas import WholesaleBusiness, WholesaleProduct
 
 client = TestClient(app)
 
-def create_csv_upload_file(content: str) -> UploadFile:
-    return UploadFile(file=io.StringIO(content), filename="products.csv", content_type="text/csv")
 
-@pytest.mark.asyncio
-async def test_successful_csv_upload():
+def create_csv_upload_file(content: str):
+    return "products.csv", content.encode("utf-8"), "text/csv"
+
+
+def test_successful_csv_upload():
     content = "name,category,price,description\nitem1,category1,10,description1\nitem2,category2,20,description2"
-    response = client.post("/csv_products", files={"file": create_csv_upload_file(content)})
+    response = client.post("/csv_products/", files={"file": create_csv_upload_file(content)})
     assert response.status_code == 200
     assert response.json() == {
         "status": "ok",
-        "data": [
-            {"name": "item1", "category": "category1", "price": "10", "description": "description1"},
-            {"name": "item2", "category": "category2", "price": "20", "description": "description2"},
-        ],
+        "data": {
+            "rows": 2,
+            "bytes": len(content.encode("utf-8")),
+            "columns": ["name", "category", "price", "description"],
+        },
     }
 
-@pytest.mark.asyncio
-async def test_invalid_csv_upload():
+
+def test_semicolon_csv_upload_is_read_as_one_column():
     content = "name;category;price;description\nitem1;category1;10;description1\nitem2;category2;20;description2"
-    response = client.post("/csv_products", files={"file": create_csv_upload_file(content)})
-    assert response.status_code == 422  # Unprocessable Entity
-    assert "CsvFileException" in response.json()["detail"]
+    response = client.post("/csv_products/", files={"file": create_csv_upload_file(content)})
+    assert response.status_code == 200
+    assert response.json()["data"]["columns"] == ["name;category;price;description"]
+
+
+def test_empty_csv_upload():
+    response = client.post("/csv_products/", files={"file": create_csv_upload_file("")})
+    assert response.status_code == 500
+    assert response.json()["detail"] == "Error while processing the CSV file"
+
+
+def test_csv_stream_decodes_across_chunk_boundaries():
+    content = "\ufeffname,description\r\ncafé,\"multi\nline £5\"\r\nthé,plain\r\n".encode("utf-8")
+    stream = CsvStream(io.BytesIO(content), chunk_size=3)
+    rows = list(stream.rows())
+    assert rows == [
+        {"name": "café", "description": "multi\nline £5"},
+        {"name": "thé", "description": "plain"},
+    ]
+    assert stream.summary() == {"rows": 2, "bytes": len(content), "columns": ["name", "description"]}
+
+
+def test_csv_stream_rejects_unbounded_lines():
+    stream = CsvStream(io.BytesIO(b"name\n" + b"x" * 100), chunk_size=16, max_line_length=32)
+    with pytest.raises(CsvFileException):
+        stream.consume()
+
+
+@pytest_asyncio.fixture
+async def wholesaler():
+    await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["src.models", "src.user.schemas",
+                                                                        "src.wholesale.schemas"]})
+    await Tortoise.generate_schemas()
+    owner = await User.create(name="Test User", username="testuser", email="test@example.com", password="x")
+    yield await WholesaleBusiness.create(business_name="Test Wholesale", website="https://example.com",
+                                         correspondence="Sales Team", email="sales@example.com",
+                                         phone="0123456789", address="1 Test Street, Testville",
+                                         category="Groceries", owner=owner)
+    await Tortoise.close_connections()
+
+
+@pytest.mark.asyncio
+async def test_import_wholesale_products_in_batches(wholesaler):
+    content = "Product,category,price,description,ean\n" + "".join(
+        f"item{i},category,{i + 1}.5,description,50123456789{i:02d}\n" for i in range(5)
+    ) + "bad,category,free,description,\n"
+    products = ProductCsvImport(CsvStream(io.BytesIO(content.encode("utf-8"))), {"Product": "name"}, batch_size=2)
+    summary = await import_wholesale_products(products, wholesaler)
+
+    assert summary["rows"] == 6
+    assert summary["imported"] == 5
+    assert summary["rejected"] == 1
+    assert summary["errors"] == [{"line": 7, "errors": ["ean is required", "price is not a number"]}]
+    assert await WholesaleProduct.filter(business=wholesaler).count() == 5
+
 
 @pytest.mark.asyncio
-async def test_empty_csv_upload():
-    content = ""
-    response = client.post("/csv_products", files={"file": create_csv_upload_file(content)})
-    assert response.status_code == 422  # Unprocessable Entity
-    assert "CsvFileException" in response.json()["detail"]
+async def test_import_requires_every_product_column(wholesaler):
+    products = ProductCsvImport(CsvStream(io.BytesIO(b"name,price\nitem,1.0\n")))
+    with pytest.raises(CsvMappingException):
+        await import_wholesale_products(products, wholesaler)
+    assert await WholesaleProduct.all().count() == 0
@@ -0,0 +1,315 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from datetime import datetime, timedelta
+from tortoise import Tortoise
+from selenium.common import NoSuchElementException, WebDriverException
+from fastapi import HTTPException
+from src.driver import services
+from src.driver.schemas import ScrapeItem, ScrapeJob
+from src.driver import jobs
+from src.driver.cache import ScrapeCache
+from src.driver.services import BrowserPool
+from src.models import ScrapedProduct
+from src.driver.exceptions import BrowserPoolTimeoutException
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.crashed = False
+        self.closed = False
+
+    @property
+    def current_url(self):
+        if self.crashed:
+            raise WebDriverException("browser crashed")
+        return "about:blank"
+
+    def quit(self):
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_pool_leases_each_browser_to_one_caller():
+    pool = BrowserPool(size=2, lease_timeout=1, factory=FakeBrowser)
+    await pool.start()
+    async with pool.lease() as first, pool.lease() as second:
+        assert first is not second
+        assert pool.in_use == 2
+    assert pool.in_use == 0
+    await pool.close()
+    assert first.closed and second.closed
+
+
+@pytest.mark.asyncio
+async def test_pool_times_out_when_all_browsers_busy():
+    pool = BrowserPool(size=1, lease_timeout=0.05, factory=FakeBrowser)
+    await pool.start()
+    async with pool.lease():
+        with pytest.raises(BrowserPoolTimeoutException):
+            async with pool.lease():
+                pass
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_queues_waiting_callers():
+    pool = BrowserPool(size=1, lease_timeout=1, factory=FakeBrowser)
+    await pool.start()
+    order = []
+
+    async def use(name):
+        async with pool.lease():
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(use("a"), use("b"), use("c"))
+    assert sorted(order) == ["a", "b", "c"]
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_replaces_crashed_browser():
+    pool = BrowserPool(size=1, lease_timeout=1, factory=FakeBrowser)
+    await pool.start()
+    async with pool.lease() as browser:
+        browser.crashed = True
+    async with pool.lease() as replacement:
+        assert replacement is not browser
+        assert browser.closed
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_starts_browsers_lazily():
+    started = []
+
+    def factory():
+        started.append(FakeBrowser())
+        return started[-1]
+
+    pool = BrowserPool(size=2, lease_timeout=1, factory=factory)
+    await pool.start(warm=False)
+    assert started == []
+    async with pool.lease():
+        assert len(started) == 1
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_scrape_batch_streams_every_result(monkeypatch):
+    async def fake_scrape_ean(ean, cost, force_refresh):
+        if ean == "missing":
+            raise HTTPException(status_code=500, detail=f"No result for EAN {ean}")
+        await asyncio.sleep(0.01 if ean == "slow" else 0)
+        return {"ean": ean, "profit": 1.0}
+
+    monkeypatch.setattr(services, "cached_scrape_ean", fake_scrape_ean)
+    items = [ScrapeItem(ean=ean, cost=2.5) for ean in ["slow", "fast", "missing"]]
+    results = [result async for result in services.scrape_batch(items)]
+
+    assert len(results) == 3
+    by_ean = {result["ean"]: result for result in results}
+    assert by_ean["fast"]["status"] == "ok"
+    assert by_ean["fast"]["data"]["profit"] == 1.0
+    assert by_ean["missing"]["status"] == "error"
+
+
+PRODUCT_PAGE = {
+    "//*[@id='pdb-ean-input']": "5012345678900",
+    "//*[@id='qi_sale_price']": "£12.99",
+    "//div[@class='pdb-title product-title']": "Test Product",
+    "//*[@id='pdb-asin-input']": "B000000001",
+    "//*[@id='qi-alerts']/ul": "No alerts",
+    "//*[@id='qi-bsr']": "1,234",
+    "//*[@id='qi-estimated-sales']/span": "300/mo",
+    "//*[@id='qi-profit']": "£3.50",
+    "//*[@id='qi-roi']": "45%",
+    "//*[@id='product-details-box']/div[3]/div[2]/span[2]": "(120)",
+    "//*[@id='product-details-box']/div[3]/div[2]/span[1]": "",
+    "//*[@id='keepa_csv_type_10']": "4",
+    "//*[@id='keepa_csv_type_7']": "2",
+    "//*[@id='keepa_csv_type_0']": "No",
+}
+STAR_CLASSES = ["fa fa-star", "fa fa-star", "fa fa-star", "fa fa-star-half-empty", "fa fa-star-o"]
+
+
+class FakeElement:
+    def __init__(self, text="", classes=""):
+        self.text = text
+        self.classes = classes
+
+    def clear(self):
+        pass
+
+    def send_keys(self, value):
+        pass
+
+    def get_attribute(self, name):
+        return self.classes
+
+    def find_elements(self, by, value):
+        return [FakeElement(classes=classes) for classes in STAR_CLASSES]
+
+
+class FakeProductPage(FakeBrowser):
+    def __init__(self, page):
+        super().__init__()
+        self.page = page
+        self.round_trips = 0
+
+    def find_element(self, by, xpath):
+        self.round_trips += 1
+        if xpath == "//*[@id='qi_cost']":
+            return FakeElement()
+        if xpath not in self.page:
+            raise NoSuchElementException(xpath)
+        return FakeElement(self.page[xpath])
+
+    def execute_script(self, script):
+        self.round_trips += 1
+        return {
+            "missing": [xpath for xpath in PRODUCT_PAGE if xpath not in self.page],
+            "text": {name: self.page.get(xpath, "") for name, xpath in zip(
+                ["ean", "price", "product", "asin", "alerts", "bsr", "est", "profit", "roi", "reviewCount", "rating",
+                 "fbaSellers", "fbmSellers", "amazon"], PRODUCT_PAGE)},
+            "stars": STAR_CLASSES,
+        }
+
+
+@pytest.mark.asyncio
+async def test_script_extraction_matches_element_extraction():
+    by_elements = FakeProductPage(PRODUCT_PAGE)
+    by_script = FakeProductPage(PRODUCT_PAGE)
+    expected = await services.scrape_product_data(by_elements, 5.0, mode="elements")
+    scraped = await services.scrape_product_data(by_script, 5.0, mode="script")
+
+    assert scraped == expected
+    assert scraped[0]["reviews"] == 3.5
+    assert scraped[0]["profit"] == 3.5
+    assert by_script.round_trips < by_elements.round_trips
+
+
+@pytest.mark.asyncio
+async def test_script_extraction_reports_missing_fields_like_element_extraction():
+    page = {xpath: text for xpath, text in PRODUCT_PAGE.items() if xpath != "//*[@id='qi-roi']"}
+    assert await services.scrape_product_data(FakeProductPage(page), 5.0, mode="script") is None
+
+
+@pytest_asyncio.fixture
+async def db():
+    await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["src.models", "src.user.schemas",
+                                                                        "src.wholesale.schemas", "src.driver.schemas"]})
+    await Tortoise.generate_schemas()
+    yield
+    await Tortoise.close_connections()
+
+
+SCRAPED = {
+    'asin': "B000000001", 'ean': "5012345678900", 'price': "£12.99", 'product': "Test Product", 'reviews': 3.5,
+    'reviewCount': "(120)", 'alerts': "No alerts", 'est': "300/mo", 'bsr': "1,234", 'profit': 3.5, 'roi': "45",
+    'fbaSellers': "4", 'fbmSellers': "2", 'amazon': "No",
+}
+
+
+@pytest.mark.asyncio
+async def test_scrape_cache_serves_memory_then_database(db):
+    cache = ScrapeCache(ttl=3600, maxsize=10)
+    assert await cache.get("5012345678900", 4.5) is None
+    await cache.set("5012345678900", 4.5, SCRAPED)
+    assert await cache.get("5012345678900", 4.5) == SCRAPED
+
+    # A fresh process only has the persisted row to go on
+    restarted = ScrapeCache(ttl=3600, maxsize=10)
+    cached = await restarted.get("5012345678900", 4.5)
+    assert cached["asin"] == "B000000001"
+    assert cached["price"] == 12.99
+    assert cached["reviewCount"] == 120
+    assert cache.stats()["memory_hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert restarted.stats()["database_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_scrape_cache_ignores_stale_rows(db):
+    cache = ScrapeCache(ttl=3600, maxsize=10)
+    await cache.set("5012345678900", 4.5, SCRAPED)
+    await ScrapedProduct.all().update(last_updated=datetime.utcnow() - timedelta(hours=2))
+    cache.clear()
+    assert await cache.get("5012345678900", 4.5) is None
+
+
+@pytest.mark.asyncio
+async def test_force_refresh_skips_cache(monkeypatch):
+    calls = []
+
+    async def fake_scrape_ean(ean, cost):
+        calls.append(ean)
+        return dict(SCRAPED)
+
+    async def fake_get(ean, cost):
+        return SCRAPED
+
+    async def fake_set(ean, cost, data):
+        pass
+
+    monkeypatch.setattr(services, "scrape_ean", fake_scrape_ean)
+    monkeypatch.setattr(services.scrape_cache, "get", fake_get)
+    monkeypatch.setattr(services.scrape_cache, "set", fake_set)
+    await services.cached_scrape_ean("5012345678900", 4.5)
+    assert calls == []
+    await services.cached_scrape_ean("5012345678900", 4.5, force_refresh=True)
+    assert calls == ["5012345678900"]
+
+
+@pytest.mark.asyncio
+async def test_scrape_job_runs_in_background_and_reports_progress(db, monkeypatch):
+    async def fake_search(browser, ean):
+        pass
+
+    async def fake_scrape(browser, cost):
+        return [dict(SCRAPED)]
+
+    monkeypatch.setattr(jobs, "browser_pool", BrowserPool(size=1, lease_timeout=1, factory=FakeBrowser))
+    monkeypatch.setattr(jobs, "scrape_cache", ScrapeCache(ttl=3600, maxsize=10))
+    monkeypatch.setattr(jobs, "search_ean_on_selleramp", fake_search)
+    monkeypatch.setattr(jobs, "scrape_product_data", fake_scrape)
+    queue = jobs.ScrapeJobQueue(workers=1, max_attempts=1, retry_delay=0, stale_after=60)
+    await queue.start()
+    job = await queue.submit(ScrapeItem(ean="5012345678900", cost=4.5))
+    assert job.status == ScrapeJob.QUEUED
+
+    snapshots = [snapshot async for snapshot in queue.subscribe(job.id)]
+    assert snapshots[-1]["status"] == ScrapeJob.DONE
+    assert snapshots[-1]["result"]["asin"] == "B000000001"
+    assert [snapshot["progress"] for snapshot in snapshots] == sorted(snapshot["progress"] for snapshot in snapshots)
+    await queue.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_scrape_job_can_be_retried_and_survives_restart(db, monkeypatch):
+    async def failing_search(browser, ean):
+        raise HTTPException(status_code=500, detail=f"No result for EAN {ean}")
+
+    monkeypatch.setattr(jobs, "browser_pool", BrowserPool(size=1, lease_timeout=1, factory=FakeBrowser))
+    monkeypatch.setattr(jobs, "scrape_cache", ScrapeCache(ttl=3600, maxsize=10))
+    monkeypatch.setattr(jobs, "search_ean_on_selleramp", failing_search)
+    queue = jobs.ScrapeJobQueue(workers=1, max_attempts=1, retry_delay=0, stale_after=60)
+    await queue.start()
+    job = await queue.submit(ScrapeItem(ean="missing", cost=4.5))
+    snapshots = [snapshot async for snapshot in queue.subscribe(job.id)]
+    assert snapshots[-1]["status"] == ScrapeJob.FAILED
+    assert snapshots[-1]["error"] == "No result for EAN missing"
+    await queue.close()
+
+    # Retried while no worker is running, then picked up by the next process
+    idle = jobs.ScrapeJobQueue(workers=0, max_attempts=1, retry_delay=0, stale_after=60)
+    await idle.start()
+    retried = await idle.retry(job.id)
+    assert retried.status == ScrapeJob.QUEUED
+    assert idle.depth == 1
+    await idle.close()
+    restarted = jobs.ScrapeJobQueue(workers=0, max_attempts=1, retry_delay=0, stale_after=60)
+    await restarted.start()
+    assert restarted.depth == 1
+    await restarted.close()
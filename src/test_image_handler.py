@@ -0,0 +1,60 @@
+import io
+import pytest
+from fastapi import UploadFile
+from PIL import Image
+from src import image_handler
+from src.exceptions import FileTooLargeException, InvalidImageException
+from src.image_handler import file_extension, process_image, read_upload, store_image, shutdown_executor
+from src.storage import LocalStorage
+
+
+def make_image(size=(1200, 600), mode="RGB", image_format="PNG"):
+    output = io.BytesIO()
+    Image.new(mode, size, (255, 0, 0, 128) if mode == "RGBA" else "red").save(output, format=image_format)
+    return output.getvalue()
+
+
+def test_file_extension():
+    assert file_extension("photo.final.JPG") == "jpg"
+    assert file_extension("noextension") == ""
+
+
+@pytest.mark.asyncio
+async def test_process_image_renders_every_size_and_format():
+    rendered = await process_image(make_image(mode="RGBA"))
+    assert set(rendered) == {"thumbnail", "list", "detail"}
+    with Image.open(io.BytesIO(rendered["thumbnail"][1]["jpeg"])) as img:
+        assert img.size == (200, 200)
+        assert img.format == "JPEG"
+    with Image.open(io.BytesIO(rendered["detail"][1]["webp"])) as img:
+        assert img.size == (800, 400)
+        assert img.format == "WEBP"
+    with pytest.raises(InvalidImageException):
+        await process_image(b"not an image")
+    shutdown_executor()
+
+
+@pytest.mark.asyncio
+async def test_read_upload_rejects_oversized_files():
+    with pytest.raises(FileTooLargeException):
+        await read_upload(UploadFile(filename="big.png", file=io.BytesIO(b"x" * 1024)), max_bytes=512)
+
+
+@pytest.mark.asyncio
+async def test_store_image_deduplicates_by_content(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_handler, "storage", LocalStorage(str(tmp_path), "localhost:8000/static"))
+    content = make_image()
+    digest, urls = await store_image(UploadFile(filename="a.png", file=io.BytesIO(content)))
+    files = sorted(path.name for path in tmp_path.rglob("*") if path.is_file())
+    assert files == ["detail.jpeg", "detail.webp", "list.jpeg", "list.webp", "manifest.json", "thumbnail.jpeg",
+                     "thumbnail.webp"]
+
+    rendered = []
+    monkeypatch.setattr(image_handler, "process_image", lambda content: rendered.append(content))
+    again, same_urls = await store_image(UploadFile(filename="b.png", file=io.BytesIO(content)))
+    assert again == digest
+    assert same_urls == urls
+    assert rendered == []
+    assert urls["srcset"]["webp"].endswith("detail.webp 800w")
+    assert urls["thumbnail"]["jpeg"] == f"localhost:8000/static/images/{digest[:2]}/{digest}/thumbnail.jpeg"
+    shutdown_executor()
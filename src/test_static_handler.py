@@ -0,0 +1,64 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from src.static_handler import IMMUTABLE_CACHE_CONTROL, CachedStaticFiles
+
+
+def create_client(tmp_path, **kwargs):
+    (tmp_path / "images" / "ab").mkdir(parents=True)
+    (tmp_path / "images" / "ab" / "thumbnail.webp").write_bytes(bytes(range(256)) * 4)
+    (tmp_path / "users").mkdir()
+    (tmp_path / "users" / "legacy.jpg").write_bytes(b"legacy")
+    static = CachedStaticFiles(directory=str(tmp_path), **kwargs)
+    app = FastAPI()
+    app.mount("/static", static, name="static")
+    return TestClient(app), static
+
+
+def test_content_addressed_files_are_immutable_and_cached(tmp_path):
+    client, static = create_client(tmp_path)
+    response = client.get("/static/images/ab/thumbnail.webp")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert response.headers["content-type"] == "image/webp"
+    assert len(response.content) == 1024
+
+    again = client.get("/static/images/ab/thumbnail.webp")
+    assert again.content == response.content
+    assert static.stats()["hits"] == 1
+    assert static.stats()["bytes"] == 1024
+
+    legacy = client.get("/static/users/legacy.jpg")
+    assert legacy.headers["cache-control"] == "no-cache"
+
+
+def test_if_none_match_returns_not_modified(tmp_path):
+    client, _ = create_client(tmp_path)
+    etag = client.get("/static/users/legacy.jpg").headers["etag"]
+    response = client.get("/static/users/legacy.jpg", headers={"If-None-Match": f'"other", W/{etag}'})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert client.get("/static/users/legacy.jpg", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_range_requests(tmp_path):
+    client, _ = create_client(tmp_path, max_file_bytes=16)
+    response = client.get("/static/images/ab/thumbnail.webp", headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == "bytes 10-19/1024"
+    assert response.content == bytes(range(10, 20))
+
+    suffix = client.get("/static/images/ab/thumbnail.webp", headers={"Range": "bytes=-4"})
+    assert suffix.content == bytes(range(252, 256))
+
+    unsatisfiable = client.get("/static/images/ab/thumbnail.webp", headers={"Range": "bytes=5000-"})
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers["content-range"] == "bytes */1024"
+
+    stale = client.get("/static/images/ab/thumbnail.webp", headers={"Range": "bytes=0-1", "If-Range": '"old"'})
+    assert stale.status_code == 200
+    assert len(stale.content) == 1024
+
+
+def test_missing_files_still_404(tmp_path):
+    client, _ = create_client(tmp_path)
+    assert client.get("/static/images/ab/missing.webp").status_code == 404
@@ -0,0 +1,105 @@
+import pytest
+from botocore.exceptions import ClientError
+from src.storage import LocalStorage, S3Storage
+
+
+async def chunks(*parts):
+    for part in parts:
+        yield part
+
+
+@pytest.mark.asyncio
+async def test_local_storage_round_trip(tmp_path):
+    storage = LocalStorage(str(tmp_path), "localhost:8000/static/")
+    await storage.put("users/1/a.jpeg", b"abc")
+    await storage.put_stream("users/1/b.jpeg", chunks(b"de", b"f"))
+    assert await storage.get("users/1/a.jpeg") == b"abc"
+    assert await storage.get("users/1/b.jpeg") == b"def"
+    assert await storage.get("users/1/missing.jpeg") is None
+    assert storage.url("users/1/a.jpeg") == "localhost:8000/static/users/1/a.jpeg"
+
+    await storage.delete_prefixes(["users/1"])
+    assert not await storage.exists("users/1/a.jpeg")
+    with pytest.raises(ValueError):
+        storage.path("../outside")
+
+
+class FakeS3Client:
+    """Just enough of the boto3 S3 client to follow what S3Storage sends."""
+
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+        self.calls = []
+
+    def put_object(self, Bucket, Key, Body, ContentType):
+        self.calls.append("put_object")
+        self.objects[Key] = Body
+
+    def create_multipart_upload(self, Bucket, Key, ContentType):
+        self.uploads["upload-1"] = {}
+        return {"UploadId": "upload-1"}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.calls.append(f"upload_part:{len(Body)}")
+        self.uploads[UploadId][PartNumber] = Body
+        return {"ETag": f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop(UploadId)
+        self.objects[Key] = b"".join(parts[part["PartNumber"]] for part in MultipartUpload["Parts"])
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.calls.append("abort")
+        self.uploads.pop(UploadId)
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        body = self.objects[Key]
+        return {"Body": type("Body", (), {"read": lambda self: body})()}
+
+    def get_paginator(self, name):
+        client = self
+
+        class Paginator:
+            def paginate(self, Bucket, Prefix):
+                yield {"Contents": [{"Key": key} for key in client.objects if key.startswith(Prefix)]}
+
+        return Paginator()
+
+    def delete_objects(self, Bucket, Delete):
+        for item in Delete["Objects"]:
+            del self.objects[item["Key"]]
+
+
+@pytest.mark.asyncio
+async def test_s3_storage_streams_multipart_uploads():
+    client = FakeS3Client()
+    storage = S3Storage("bucket", "https://cdn.example.com", prefix="uploads", part_size=0, client=client)
+    part_size = storage.part_size
+    await storage.put_stream("images/big.webp", chunks(b"a" * part_size, b"b" * (part_size // 2), b"c" * 10))
+    assert client.calls == [f"upload_part:{part_size}", f"upload_part:{part_size // 2 + 10}"]
+    assert await storage.get("images/big.webp") == b"a" * part_size + b"b" * (part_size // 2) + b"c" * 10
+
+    await storage.put_stream("images/small.webp", chunks(b"tiny"))
+    assert client.objects["uploads/images/small.webp"] == b"tiny"
+    assert await storage.get("images/missing.webp") is None
+
+    await storage.delete_prefix("images")
+    assert client.objects == {}
+
+
+@pytest.mark.asyncio
+async def test_s3_storage_aborts_failed_multipart_uploads():
+    client = FakeS3Client()
+    storage = S3Storage("bucket", "https://cdn.example.com", client=client)
+
+    async def failing():
+        yield b"a" * storage.part_size
+        raise RuntimeError("client disconnected")
+
+    with pytest.raises(RuntimeError):
+        await storage.put_stream("images/big.webp", failing())
+    assert client.calls[-1] == "abort"
+    assert client.uploads == {}
@@ -88,3 +88,30 @@ async def test_password_reset_request(client: TestClient, test_user: User_Pydant
     assert response.status_code == 200
     data = response.json()
     assert data["msg"] == "Email has been sent with instructions to reset your password."
+
+
+@pytest.mark.asyncio
+async def test_current_user_is_cached_until_invalidated(monkeypatch):
+    from src.auth.services import create_access_token
+    from src.user import services
+    from src.user.schemas import User
+
+    loads = []
+
+    async def fake_get(id):
+        loads.append(id)
+        return User(id=int(id), name="Test User", username="testuser", email="test@example.com", password="x")
+
+    monkeypatch.setattr(services.User, "get", fake_get)
+    token = create_access_token({"id": 7})
+    first = await services.get_current_user(token)
+    first.name = "Changed Locally"
+    second = await services.get_current_user(token)
+    assert loads == ["7"]
+    assert second.name == "Test User"
+    assert services.token_cache[token][0] == "7"
+
+    services.invalidate_user(7)
+    assert token not in services.token_cache
+    await services.get_current_user(token)
+    assert loads == ["7", "7"]
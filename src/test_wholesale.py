@@ -0,0 +1,96 @@
+import pytest
+import pytest_asyncio
+from tortoise import Tortoise
+from src.exceptions import InvalidCursorException
+from src.pagination import paginate
+from src.user.schemas import User
+from src.wholesale.router import get_all_wholesaler_products
+from src.wholesale.schemas import WholesaleBusiness, WholesaleProduct, WholesaleScrapedProduct,\
+    wholesale_product_pydantic
+from src.wholesale.services import delete_wholesaler_tree
+
+
+@pytest_asyncio.fixture
+async def db():
+    await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["src.models", "src.user.schemas",
+                                                                        "src.wholesale.schemas"]})
+    await Tortoise.generate_schemas()
+    yield
+    await Tortoise.close_connections()
+
+
+async def create_wholesaler(username="testuser"):
+    owner = await User.create(name="Test User", username=username, email=f"{username}@example.com", password="x")
+    wholesaler = await WholesaleBusiness.create(business_name="Test Wholesale", website="https://example.com",
+                                                correspondence="Sales Team", email="sales@example.com",
+                                                phone="0123456789", address="1 Test Street, Testville",
+                                                category="Groceries", owner=owner)
+    return owner, wholesaler
+
+
+async def create_products(wholesaler, prices, category="Snacks"):
+    for i, price in enumerate(prices):
+        await WholesaleProduct.create(name=f"item{i}", category=category, price=price, description="description",
+                                      ean=f"50123456789{i:02d}", business=wholesaler)
+
+
+@pytest.mark.asyncio
+async def test_paginate_walks_every_row_once_with_ties(db):
+    owner, wholesaler = await create_wholesaler()
+    await create_products(wholesaler, [5.0, 1.0, 5.0, 3.0, 5.0, 2.0, 4.0])
+    seen, cursor = [], None
+    while True:
+        page, cursor = await paginate(WholesaleProduct.filter(business_id=wholesaler.id), wholesale_product_pydantic,
+                                      sort="-price", cursor=cursor, limit=2)
+        seen.extend(page)
+        if cursor is None:
+            break
+    assert [product.price for product in seen] == [5.0, 5.0, 5.0, 4.0, 3.0, 2.0, 1.0]
+    assert len({product.id for product in seen}) == 7
+
+
+@pytest.mark.asyncio
+async def test_paginate_rejects_cursor_from_other_sort(db):
+    owner, wholesaler = await create_wholesaler()
+    await create_products(wholesaler, [1.0, 2.0, 3.0])
+    _, cursor = await paginate(WholesaleProduct.all(), wholesale_product_pydantic, sort="price", limit=1)
+    with pytest.raises(InvalidCursorException):
+        await paginate(WholesaleProduct.all(), wholesale_product_pydantic, sort="-last_updated", cursor=cursor)
+    with pytest.raises(InvalidCursorException):
+        await paginate(WholesaleProduct.all(), wholesale_product_pydantic, sort="price", cursor="not-a-cursor")
+
+
+@pytest.mark.asyncio
+async def test_wholesaler_products_listing_filters_and_pages(db):
+    owner, wholesaler = await create_wholesaler()
+    await create_products(wholesaler, [1.0, 2.0, 3.0, 4.0])
+    await create_products(wholesaler, [2.5], category="Drinks")
+    response = await get_all_wholesaler_products(wholesaler.id, cursor=None, limit=2, sort="price",
+                                                 category="Snacks", min_price=2.0, max_price=None,
+                                                 current_user=owner)
+    assert [product.price for product in response["data"]] == [2.0, 3.0]
+    response = await get_all_wholesaler_products(wholesaler.id, cursor=response["next_cursor"], limit=2,
+                                                 sort="price", category="Snacks", min_price=2.0, max_price=None,
+                                                 current_user=owner)
+    assert [product.price for product in response["data"]] == [4.0]
+    assert response["next_cursor"] is None
+
+
+@pytest.mark.asyncio
+async def test_delete_wholesaler_tree_removes_only_its_rows(db):
+    owner, wholesaler = await create_wholesaler()
+    other_owner, other = await create_wholesaler("otheruser")
+    await create_products(wholesaler, [1.0, 2.0, 3.0])
+    await create_products(other, [4.0])
+    product = await WholesaleProduct.filter(business_id=wholesaler.id).first()
+    await WholesaleScrapedProduct.create(asin="B000000001", ean=product.ean, cost=1.0, rating=4.0, reviews=10, ROI=20.0,
+                                         price=2.0, profit=0.5, FBA="3", FBM="1", AMZ="No", name="item",
+                                         url="https://example.com", business=wholesaler, product=product)
+
+    prefixes = await delete_wholesaler_tree(wholesaler)
+
+    assert not await WholesaleBusiness.exists(id=wholesaler.id)
+    assert await WholesaleProduct.filter(business_id=wholesaler.id).count() == 0
+    assert await WholesaleScrapedProduct.all().count() == 0
+    assert await WholesaleProduct.filter(business_id=other.id).count() == 1
+    assert f"wholesale_products/{wholesaler.id}" in prefixes
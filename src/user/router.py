@@ -1,19 +1,16 @@
-import shutil
-
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
 from fastapi.encoders import jsonable_encoder
 from tortoise.exceptions import DoesNotExist
 from src.auth.services import create_access_token
-from src.user.services import get_current_user
+from src.user.services import get_current_user, invalidate_user
 from src.todos.schemas import Todo
 from src.user.schemas import User, PasswordReset, PasswordResetRequest, UserResponse, UserCreate, UserUpdate_Pydantic, User_Pydantic
 from src.user.utils import get_password_hash
 from src.email_handler import send_registration_mail, send_verification_mail, password_reset
+from src.image_handler import ALLOWED_EXTENSIONS, file_extension, store_image
+from src.storage import storage
 import secrets
-from PIL import Image
 from datetime import datetime
-import os
-import shutil
 from src.exceptions import ServerErrorException, UserNotFoundException, UnauthorizedUserException, InvalidIdException
 from src.user.exceptions import DetailNotAllowedException, VerificationKeyNotFoundException, UserVerifiedException,\
     UserUpdateException
@@ -65,6 +62,7 @@ async def verification(token: str):
             raise UserVerifiedException()
         else:
             await User.filter(id=user.id).update(is_verified=True)
+            invalidate_user(user.id)
             await send_registration_mail("Registration successful", user.email,
                                          {
                                              "title": "Registration successful",
@@ -102,21 +100,21 @@ async def resend_verification(claimingUsername: str):
 @router.post("/details", response_description="Get user details", response_model=UserResponse)
 async def details(current_user=Depends(get_current_user)):
     try:
-        user = await User.get(id=current_user.id)
-        return user
+        return current_user
     except Exception as e:
         raise ServerErrorException(str(e))
 
 @router.put("/update", response_description="Update user details", response_model=UserResponse)
 async def update_user(user_update: UserUpdate_Pydantic, user: User_Pydantic = Depends(get_current_user)):
     try:
-        user_obj = await User.get(id=user.id)
+        user_obj = user
         user_obj.name = user_update.name or user_obj.name
         user_obj.username = user_update.username or user_obj.username
         user_obj.email = user_update.email or user_obj.email
 
         # Save the changes to the database
-        await user_obj.save()
+        await user_obj.save(update_fields=["name", "username", "email"])
+        invalidate_user(user_obj.id)
 
         # Convert the updated user object to a UserResponse Pydantic model
         user_response = UserResponse.from_orm(user_obj)
@@ -140,11 +138,8 @@ async def delete_user(username: str, current_user: User_Pydantic = Depends(get_c
         
         # Delete user
         await user.delete()
-        static_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
-                                     'static')
-        folder_path = os.path.join(static_folder, f"users/{user.id}")
-        if os.path.exists(folder_path):
-            shutil.rmtree(folder_path)
+        invalidate_user(user.id)
+        await storage.delete_prefix(f"users/{user.id}")
         
         return {"message": "User deleted successfully"}
     except Exception as e:
@@ -155,31 +150,16 @@ async def delete_user(username: str, current_user: User_Pydantic = Depends(get_c
 @router.post("/images/profile")
 async def upload_profile_picture(file: UploadFile = File(...), current_user=Depends(get_current_user)):
     try:
-        user_id = await User.get(id=current_user.id)
-        filepath = f"./../static/users/{user_id}/"
-        if not os.path.exists(filepath):
-            os.makedirs(filepath)
-        filename = file.filename
-        extension = filename.split(".")[1]
-        if extension not in ["jpg", "png", "jpeg"]:
+        extension = file_extension(file.filename)
+        if extension not in ALLOWED_EXTENSIONS:
             return {"status": "error", "detail": "file extension not allowed"}
-        token_name = secrets.token_hex(10) + "." + extension
-        generated_name = filepath + token_name
-        file_content = await file.read()
-        with open(generated_name, "wb") as file:
-            file.write(file_content)
-        img = Image.open(generated_name)
-        img = img.resize(size=(200, 200))
-        img.save(generated_name)
-        file.close()
-        user = await User.get(id=current_user.id)
-        if user:
-            user.profile_picture = token_name
-            await user.save()
-        else:
-            raise UnauthorizedUserException()
-        file_url = "localhost:8000" + generated_name[1:]
-        return {"status": "ok", "filename": file_url}
+        digest, urls = await store_image(file)
+        current_user.profile_picture = digest
+        await current_user.save(update_fields=["profile_picture"])
+        invalidate_user(current_user.id)
+        return {"status": "ok", "filename": urls["thumbnail"]["jpeg"], "images": urls}
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise ServerErrorException(str(e))
 
@@ -210,6 +190,7 @@ async def reset_password(token: str, new_password: PasswordReset):
         if len(reset_data) >= 1:
             user = await get_current_user(token)
             await User.filter(id=user.id).update(password=reset_data["password"])
+            invalidate_user(user.id)
             updated_user = await User.get(id=user.id)
             if updated_user is not None:
                 return updated_user
@@ -1,16 +1,54 @@
+import copy
+import time
+from cachetools import TLRUCache, TTLCache
 from fastapi import Depends, HTTPException
+from jose import jwt
 from tortoise.exceptions import DoesNotExist
+from src.config import settings
 from src.user.schemas import User
 from src.auth.services import verify_access_token, oauth2_scheme
 
 
+def _token_expiry(token, entry, now):
+    # Never reuse a token past its own exp claim
+    _, expires = entry
+    return now + min(settings.auth_token_cache_ttl, expires - time.time())
+
+
+# token -> (user id, exp), saves decoding and verifying the JWT signature on every request
+token_cache = TLRUCache(maxsize=settings.auth_cache_size, ttu=_token_expiry)
+# user id -> User, short lived so changes made on other app workers show up quickly
+user_cache = TTLCache(maxsize=settings.auth_cache_size, ttl=settings.auth_user_cache_ttl)
+
+
+def user_id_from_token(token: str) -> str:
+    entry = token_cache.get(token)
+    if entry is None:
+        user_id = verify_access_token(token).id
+        entry = (user_id, jwt.get_unverified_claims(token).get("exp", 0))
+        token_cache[token] = entry
+    return entry[0]
+
+
+def invalidate_user(user_id):
+    user_id = str(user_id)
+    user_cache.pop(user_id, None)
+    for token, (cached_id, _) in list(token_cache.items()):
+        if cached_id == user_id:
+            token_cache.pop(token, None)
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     try:
-        current_user_id = verify_access_token(token).id
-        try:
-            current_user = await User.get(id=current_user_id)
-            return current_user
-        except DoesNotExist:
-            raise HTTPException(status_code=404, detail="User not found")
+        current_user_id = user_id_from_token(token)
+        current_user = user_cache.get(current_user_id)
+        if current_user is None:
+            try:
+                current_user = await User.get(id=current_user_id)
+            except DoesNotExist:
+                raise HTTPException(status_code=404, detail="User not found")
+            user_cache[current_user_id] = current_user
+        # Handlers may change and save the user they get, the cached instance stays untouched
+        return copy.copy(current_user)
     except HTTPException as e:
-        raise e
\ No newline at end of file
+        raise e
@@ -1,8 +1,5 @@
-import os
-import secrets
-import shutil
-from PIL import Image
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
+from typing import Optional
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Query, BackgroundTasks
 from tortoise.exceptions import DoesNotExist
 from src.wholesale.schemas import wholesale_business_pydantic, wholesale_business_pydanticIn, wholesale_product_pydantic,\
     wholesale_product_pydanticIn, wholesale_scraped_product_pydantic, wholesale_scraped_product_pydanticIn,\
@@ -13,6 +10,10 @@ from src.user.services import get_current_user
 from src.user.schemas import User_Pydantic
 from src.exceptions import ServerErrorException, UnauthorizedUserException, ProductNotFoundException, InvalidIdException
 from src.wholesale.exceptions import WholesaleNotFoundException
+from src.wholesale.services import delete_wholesaler_tree
+from src.image_handler import ALLOWED_EXTENSIONS, file_extension, store_image
+from src.storage import storage
+from src.pagination import paginate, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 
 
 router = APIRouter(
@@ -92,7 +93,7 @@ async def update_wholesale(wholesale_id: int, update_info: wholesale_business_py
 
 
 @router.delete('/delete/{wholesale_id}')
-async def delete_wholesale(wholesale_id: int, current_user=Depends(get_current_user)):
+async def delete_wholesale(wholesale_id: int, background_tasks: BackgroundTasks, current_user=Depends(get_current_user)):
     if wholesale_id == 0:
         raise HTTPException(status_code=400, detail="Invalid wholesale id")
     try:
@@ -101,24 +102,12 @@ async def delete_wholesale(wholesale_id: int, current_user=Depends(get_current_u
         if owner != current_user:
             raise UnauthorizedUserException("User not authorized")
         try:
-            wholesale_products = await WholesaleProduct.filter(business=wholesaler).all()
-            scraped_wholesale_products = await WholesaleScrapedProduct.filter(business=wholesaler).all()
-            if wholesale_products:
-                for product in wholesale_products:
-                    await delete_wholesale_product(wholesale_id, product.id)
-            if scraped_wholesale_products:
-                for product in scraped_wholesale_products:
-                    await delete_scraped_wholesale_product(wholesale_id, product.id)
-            await WholesaleProduct.filter(business=wholesaler).delete()
-            await WholesaleScrapedProduct.filter(business=wholesaler).delete()
-        except Exception as e:
-            print(e)
-            return {"status": "error", "detail": "Internal Server Error while deleting Wholesale Products"}
-        try:
-            await wholesaler.delete()
+            prefixes = await delete_wholesaler_tree(wholesaler)
         except Exception as e:
             print(e)
             return {"status": "error", "detail": "Internal Server Error while deleting Wholesaler"}
+        # Image folders can be large, remove them after the response has gone out
+        background_tasks.add_task(storage.delete_prefixes, prefixes)
         return {"status": "ok", "response": "Successfully deleted Wholesaler and associated products"}
     except DoesNotExist as dne:
         raise WholesaleNotFoundException(str(dne))
@@ -146,7 +135,12 @@ async def add_wholesale_product(wholesale_id: int, product_details: wholesale_pr
 
 
 @router.get('/product/get/{wholesale_id}/products')
-async def get_all_wholesaler_products(wholesale_id: int, current_user: User_Pydantic = Depends(get_current_user)):
+async def get_all_wholesaler_products(wholesale_id: int, cursor: Optional[str] = None,
+                                      limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                                      sort: str = Query("id", regex="^-?(id|last_updated|price)$"),
+                                      category: Optional[str] = None, min_price: Optional[float] = None,
+                                      max_price: Optional[float] = None,
+                                      current_user: User_Pydantic = Depends(get_current_user)):
     if wholesale_id == 0:
         raise HTTPException(status_code=400, detail="Invalid product id")
     try:
@@ -154,10 +148,19 @@ async def get_all_wholesaler_products(wholesale_id: int, current_user: User_Pyda
         owner = await wholesaler.owner
         if owner != current_user:
             raise UnauthorizedUserException("User not authorized")
-        response = await wholesale_product_pydantic.from_queryset(WholesaleProduct.filter(business=wholesaler))
-        return {"status": "ok", "data": response}
+        products = WholesaleProduct.filter(business_id=wholesaler.id)
+        if category is not None:
+            products = products.filter(category=category)
+        if min_price is not None:
+            products = products.filter(price__gte=min_price)
+        if max_price is not None:
+            products = products.filter(price__lte=max_price)
+        response, next_cursor = await paginate(products, wholesale_product_pydantic, sort, cursor, limit)
+        return {"status": "ok", "data": response, "next_cursor": next_cursor}
     except DoesNotExist as dne:
         raise WholesaleNotFoundException(str(dne))
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise ServerErrorException(str(e))
 
@@ -216,11 +219,7 @@ async def delete_wholesale_product(wholesale_id: int, product_id: int, current_u
         if owner != current_user:
             raise UnauthorizedUserException("User not authorized")
         await product.delete()
-        static_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
-                                     'static')
-        folder_path = os.path.join(static_folder, f"wholesale_products/{wholesale_id}/{product_id}")
-        if os.path.exists(folder_path):
-            shutil.rmtree(folder_path)
+        await storage.delete_prefix(f"wholesale_products/{wholesale_id}/{product_id}")
         return {"status": "ok"}
     except DoesNotExist as dne:
         raise ProductNotFoundException(str(dne))
@@ -233,33 +232,20 @@ async def create_upload_file(wholesale_id: int, product_id: int, file: UploadFil
     if wholesale_id == 0 or product_id == 0:
         raise HTTPException(status_code=400, detail="Invalid ID combination provided")
     try:
-        static_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
-                                     'static')
-        filepath = os.path.join(static_folder, f"wholesale_products/{wholesale_id}/{product_id}/")
-        if not os.path.exists(filepath):
-            os.makedirs(filepath)
-        filename = file.filename
-        extension = filename.split(".")[1]
-        if extension not in ["jpg", "png", "jpeg"]:
+        extension = file_extension(file.filename)
+        if extension not in ALLOWED_EXTENSIONS:
             return {"status": "error", "detail": "file extension not allowed"}
-        token_name = secrets.token_hex(10) + "." + extension
-        generated_name = filepath + token_name
-        file_content = await file.read()
-        with open(generated_name, "wb") as file:
-            file.write(file_content)
-        img = Image.open(generated_name)
-        img = img.resize(size=(200, 200))
-        img.save(generated_name)
-        file.close()
+        digest, urls = await store_image(file)
         product = await WholesaleProduct.get(id=product_id)
         wholesale = await product.business
         owner = await wholesale.owner
         if owner != current_user:
             raise UnauthorizedUserException("User not authorized")
-        product.product_image = token_name
+        product.product_image = digest
         await product.save()
-        file_url = "localhost:8000" + generated_name[1:]
-        return {"status": "ok", "filename": file_url}
+        return {"status": "ok", "filename": urls["thumbnail"]["jpeg"], "images": urls}
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise ServerErrorException(str(e))
 
@@ -289,7 +275,12 @@ async def add_scraped_wholesale_product(wholesale_id: int, product_id: int,
 
 
 @router.get('/product/scraped/get/{wholesale_id}/products')
-async def get_all_scraped_wholesaler_products(wholesale_id: int, current_user: User_Pydantic = Depends(get_current_user)):
+async def get_all_scraped_wholesaler_products(wholesale_id: int, cursor: Optional[str] = None,
+                                              limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                                              sort: str = Query("id", regex="^-?(id|last_updated|price|ROI|profit)$"),
+                                              min_price: Optional[float] = None, max_price: Optional[float] = None,
+                                              min_roi: Optional[float] = None, min_profit: Optional[float] = None,
+                                              current_user: User_Pydantic = Depends(get_current_user)):
     if wholesale_id == 0:
         raise InvalidIdException("Invalid product id")
     try:
@@ -297,11 +288,21 @@ async def get_all_scraped_wholesaler_products(wholesale_id: int, current_user: U
         owner = await  wholesaler.owner
         if owner != current_user:
             raise UnauthorizedUserException("User not authorized")
-        response = await wholesale_scraped_product_pydantic.from_queryset(WholesaleScrapedProduct.filter(business=
-                                                                                                         wholesaler))
-        return {"status": "ok", "data": response}
+        products = WholesaleScrapedProduct.filter(business_id=wholesaler.id)
+        if min_price is not None:
+            products = products.filter(price__gte=min_price)
+        if max_price is not None:
+            products = products.filter(price__lte=max_price)
+        if min_roi is not None:
+            products = products.filter(ROI__gte=min_roi)
+        if min_profit is not None:
+            products = products.filter(profit__gte=min_profit)
+        response, next_cursor = await paginate(products, wholesale_scraped_product_pydantic, sort, cursor, limit)
+        return {"status": "ok", "data": response, "next_cursor": next_cursor}
     except DoesNotExist as dne:
         raise WholesaleNotFoundException(str(dne))
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise ServerErrorException(str(e))
 
@@ -368,11 +369,7 @@ async def delete_scraped_wholesale_product(wholesale_id: int, product_id: int, c
         if owner != current_user:
             raise UnauthorizedUserException("User not authorized")
         await product.delete()
-        static_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
-                                     'static')
-        folder_path = os.path.join(static_folder, f"wholesale_scraped/{wholesale_id}/{product_id}")
-        if os.path.exists(folder_path):
-            shutil.rmtree(folder_path)
+        await storage.delete_prefix(f"wholesale_scraped/{wholesale_id}/{product_id}")
         return {"status": "ok"}
     except DoesNotExist as dne:
         raise ProductNotFoundException(str(dne))
@@ -385,32 +382,19 @@ async def create_scraped_upload_file(wholesale_id: int, product_id: int, file: U
     if wholesale_id == 0 or product_id == 0:
         raise InvalidIdException("Invalid ID combination provided")
     try:
-        static_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
-                                     'static')
-        filepath = os.path.join(static_folder, f"wholesale_scraped/{wholesale_id}/{product_id}/")
-        if not os.path.exists(filepath):
-            os.makedirs(filepath)
-        filename = file.filename
-        extension = filename.split(".")[1]
-        if extension not in ["jpg", "png", "jpeg"]:
+        extension = file_extension(file.filename)
+        if extension not in ALLOWED_EXTENSIONS:
             return {"status": "error", "detail": "file extension not allowed"}
-        token_name = secrets.token_hex(10) + "." + extension
-        generated_name = filepath + token_name
-        file_content = await file.read()
-        with open(generated_name, "wb") as file:
-            file.write(file_content)
-        img = Image.open(generated_name)
-        img = img.resize(size=(200, 200))
-        img.save(generated_name)
-        file.close()
+        digest, urls = await store_image(file)
         product = await WholesaleScrapedProduct.get(id=product_id)
         wholesale = await product.business
         owner = await  wholesale.owner
         if owner != current_user:
             raise UnauthorizedUserException("User not authorized")
-        product.product_image = token_name
+        product.product_image = digest
         await product.save()
-        file_url = "localhost:8000" + generated_name[1:]
-        return {"status": "ok", "filename": file_url}
+        return {"status": "ok", "filename": urls["thumbnail"]["jpeg"], "images": urls}
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise ServerErrorException(str(e))
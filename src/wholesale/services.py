@@ -0,0 +1,13 @@
+from typing import List
+from tortoise.transactions import in_transaction
+from src.wholesale.schemas import WholesaleBusiness, WholesaleProduct, WholesaleScrapedProduct
+
+
+async def delete_wholesaler_tree(wholesaler: WholesaleBusiness) -> List[str]:
+    # Children first, each level in one statement, all or nothing
+    async with in_transaction() as connection:
+        await WholesaleScrapedProduct.filter(business_id=wholesaler.id).using_db(connection).delete()
+        await WholesaleProduct.filter(business_id=wholesaler.id).using_db(connection).delete()
+        await WholesaleBusiness.filter(id=wholesaler.id).using_db(connection).delete()
+    # Storage prefixes of images uploaded per product before they were stored by content hash
+    return [f"wholesale_products/{wholesaler.id}", f"wholesale_scraped/{wholesaler.id}"]